@@ -0,0 +1,413 @@
+# Copyright 2015 Citrix Systems, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmarks of the NetScaler driver hot paths against the fake NCC.
+
+Measures NSClient request throughput over HTTP and HTTPS, the time of a
+provision status collection cycle for 10, 1000 and 10000 pending
+entities, PayloadPreparer throughput for large pools and the memory
+growth of the status collection over many cycles.
+
+Needs the driver installed in neutron_lbaas like in a deployment, the
+fake NCC is imported from tools/fake_ncc.py of this tree. The results
+are written as JSON; with --compare the relative change to an earlier
+result file is printed for every benchmark:
+
+    python benchmarks/bench_driver.py --output before.json
+    python benchmarks/bench_driver.py --output after.json \\
+        --compare before.json
+"""
+
+import eventlet
+# Like neutron-server, so status collection workers and NSClient
+# requests run in green threads.
+eventlet.monkey_patch()
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from neutron.plugins.common import constants
+
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import ncc_client
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import (
+    netscaler_driver_v2 as driver_v2)
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import sharding
+
+# The fake NCC is a development tool, not part of the driver package.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'tools'))
+import fake_ncc  # noqa
+
+ENTITY_COUNTS = (10, 1000, 10000)
+# Entities of one load balancer tree: LB, listener, pool, monitor and
+# the members of the pool.
+MAX_ENTITIES_PER_LB = 50
+POOL_SIZES = (100, 1000, 10000)
+
+
+class _Entity(object):
+
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+class _FakeManager(object):
+
+    """Stands in for the entity managers, completes entities in memory."""
+
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+
+    def successful_completion(self, context, entity, delete=False):
+        entity.provisioning_status = constants.ACTIVE
+        self.completed += 1
+
+    def failed_completion(self, context, entity):
+        entity.provisioning_status = constants.ERROR
+        self.failed += 1
+
+
+class _FakePlugin(object):
+
+    def __init__(self, lbs):
+        self.db = self
+        self.lbs = lbs
+        self._core_plugin = _FakeCorePlugin()
+
+    def get_loadbalancers(self, context, filters=None):
+        filters = filters or {}
+        statuses = set(filters.get(driver_v2.PROV) or [])
+        ids = filters.get('id')
+        ids = set(ids) if ids is not None else None
+        return [lb for lb in self.lbs
+                if (not statuses or lb.provisioning_status in statuses) and
+                (ids is None or lb.id in ids)]
+
+
+class _FakeCorePlugin(object):
+
+    def get_subnets(self, context, filters=None):
+        return [{'id': subnet_id, 'network_id': 'net-' + subnet_id,
+                 'name': 'subnet-' + subnet_id}
+                for subnet_id in filters['id']]
+
+    def get_networks(self, context, filters=None):
+        return [{'id': network_id, driver_v2.PROV_NET_TYPE: 'vlan',
+                 driver_v2.PROV_SEGMT_ID: 100}
+                for network_id in filters['id']]
+
+
+def _make_tree(member_count, status=constants.PENDING_CREATE):
+    lb_id = str(uuid.uuid4())
+    lb = _Entity(id=lb_id, tenant_id='tenant', name='lb', description='',
+                 vip_address='10.0.0.10', vip_subnet_id='vip-subnet',
+                 admin_state_up=True, provisioning_status=status,
+                 provider=_Entity(provider_name=driver_v2.NETSCALER))
+    listener = _Entity(id=str(uuid.uuid4()), tenant_id='tenant',
+                       name='listener', description='', protocol='HTTP',
+                       protocol_port=80, loadbalancer_id=lb_id,
+                       sni_containers=[], default_tls_container_id=None,
+                       connection_limit=-1, admin_state_up=True,
+                       provisioning_status=status)
+    pool = _Entity(id=str(uuid.uuid4()), tenant_id='tenant', name='pool',
+                   description='', protocol='HTTP',
+                   lb_algorithm='ROUND_ROBIN', admin_state_up=True,
+                   sessionpersistence=None, provisioning_status=status)
+    pool.members = [
+        _Entity(id=str(uuid.uuid4()), tenant_id='tenant',
+                address='10.0.%d.%d' % (i // 250, i % 250 + 1),
+                protocol_port=8080, subnet_id='member-subnet-%d' % (i % 4),
+                weight=1, admin_state_up=True, provisioning_status=status)
+        for i in range(member_count)]
+    pool.healthmonitor = _Entity(
+        id=str(uuid.uuid4()), tenant_id='tenant', type='HTTP', delay=5,
+        timeout=5, max_retries=3, admin_state_up=True, http_method='GET',
+        url_path='/', expected_codes='200', provisioning_status=status)
+    listener.default_pool = pool
+    lb.listeners = [listener]
+    return lb
+
+
+def _make_trees(entity_count):
+    per_lb = min(entity_count, MAX_ENTITIES_PER_LB)
+    return [_make_tree(per_lb - 4) for __ in range(entity_count // per_lb)]
+
+
+def _tree_entities(lb):
+    listener = lb.listeners[0]
+    pool = listener.default_pool
+    entities = [(driver_v2.LBS_RESOURCE, lb),
+                (driver_v2.LISTENERS_RESOURCE, listener),
+                (driver_v2.POOLS_RESOURCE, pool),
+                (driver_v2.MONITORS_RESOURCE, pool.healthmonitor)]
+    entities.extend((driver_v2.MEMBERS_RESOURCE, member)
+                    for member in pool.members)
+    return entities
+
+
+def _make_driver(client, lbs, workers):
+    driver = object.__new__(driver_v2.NetScalerLoadBalancerDriverV2)
+    driver.admin_ctx = None
+    driver.plugin = _FakePlugin(lbs)
+    # No database session; every fake load balancer is a NetScaler one.
+    driver._get_netscaler_loadbalancers = (
+        lambda context, filters: driver.plugin.get_loadbalancers(
+            context, filters=filters))
+    driver.client = client
+    driver.request_queue = None
+    driver.ncc_cleanup_mode = "False"
+    driver.pagesize_status_collection = driver_v2.DEFAULT_PAGE_SIZE
+    driver.status_collection_workers = workers
+    driver.status_collection_deadline = 3600
+    driver.pending_scan_interval = 3600
+    driver._last_pending_scan = None
+    driver._lbs_in_progress = set()
+    driver.status_tracking_timeout = 0
+    driver.shards = sharding.ShardAssignment()
+    manager = _FakeManager()
+    driver.load_balancer = manager
+    driver.listener = manager
+    driver.pool = manager
+    driver.member = manager
+    driver.health_monitor = manager
+    return driver, manager
+
+
+def _make_pending(fake, lbs, operation='POST',
+                  status=constants.PENDING_CREATE):
+    """Set every entity pending with a finished journal context."""
+    fake.clear_journal()
+    for lb in lbs:
+        for entity_type, entity in _tree_entities(lb):
+            entity.provisioning_status = status
+            fake.submit(entity_type, entity.id, operation, _no_change)
+    fake.advance_jobs()
+
+
+def _no_change():
+    pass
+
+
+def _result(name, value, unit, **params):
+    return {'name': name, 'value': value, 'unit': unit, 'params': params}
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def bench_client_requests(fake, requests, concurrency):
+    client = ncc_client.NSClient(fake.uri, fake.username, fake.password,
+                                 connection_pool_size=concurrency)
+    path = "%s/%s" % (driver_v2.RESOURCE_PREFIX, driver_v2.LBS_RESOURCE)
+    client.retrieve_resource("GLOBAL", path)
+    per_thread = requests // concurrency
+
+    def run():
+        for __ in range(per_thread):
+            client.retrieve_resource("GLOBAL", path)
+
+    threads = [threading.Thread(target=run) for __ in range(concurrency)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    return _result('nsclient_requests', per_thread * concurrency / elapsed,
+                   'requests/s', scheme=fake.uri.split(':')[0],
+                   concurrency=concurrency)
+
+
+def bench_provision_cycle(fake, entity_count, workers, repeat):
+    client = ncc_client.NSClient(fake.uri, fake.username, fake.password)
+    lbs = _make_trees(entity_count)
+    driver, manager = _make_driver(client, lbs, workers)
+    timings = []
+    for __ in range(repeat):
+        _make_pending(fake, lbs)
+        driver._last_pending_scan = None
+        manager.completed = 0
+        start = time.time()
+        driver.collect_provision_status()
+        timings.append(time.time() - start)
+        if manager.completed != entity_count:
+            raise RuntimeError("cycle completed %d of %d entities" %
+                               (manager.completed, entity_count))
+    return _result('provision_status_cycle', _median(timings), 's',
+                   pending_entities=entity_count, workers=workers)
+
+
+def bench_payload_preparer(pool_size, repeat):
+    preparer = driver_v2.PayloadPreparer()
+    lb = _make_tree(pool_size)
+    plugin = _FakePlugin([lb])
+    timings = []
+    for __ in range(repeat):
+        driver_v2.NETWORK_INFO_CACHE.clear()
+        start = time.time()
+        preparer.prepare_graph_for_creation(None, plugin, lb)
+        timings.append(time.time() - start)
+    return _result('payload_preparer_graph', pool_size / _median(timings),
+                   'members/s', pool_size=pool_size)
+
+
+def bench_status_memory(fake, entity_count, cycles):
+    client = ncc_client.NSClient(fake.uri, fake.username, fake.password)
+    lbs = _make_trees(entity_count)
+    driver, __ = _make_driver(client, lbs, 1)
+    samples = []
+    for cycle in range(cycles):
+        _make_pending(fake, lbs, 'PUT', constants.PENDING_UPDATE)
+        driver._last_pending_scan = None
+        driver.collect_provision_status()
+        if cycle in (cycles // 10, cycles - 1):
+            gc.collect()
+            samples.append((len(gc.get_objects()),
+                            resource.getrusage(resource.RUSAGE_SELF)
+                            .ru_maxrss))
+    (objects_before, rss_before), (objects_after, rss_after) = samples
+    measured = cycles - 1 - cycles // 10
+    return [
+        _result('status_memory_objects_per_cycle',
+                float(objects_after - objects_before) / measured,
+                'objects/cycle', pending_entities=entity_count,
+                cycles=cycles),
+        _result('status_memory_max_rss_growth', rss_after - rss_before,
+                'KiB', pending_entities=entity_count, cycles=cycles),
+    ]
+
+
+def _make_certificate(directory):
+    certfile = os.path.join(directory, 'fake_ncc.pem')
+    try:
+        subprocess.check_call(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+             '-keyout', certfile, '-out', certfile, '-days', '1',
+             '-subj', '/CN=127.0.0.1'],
+            stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return certfile
+
+
+def run(args):
+    results = []
+    fake = fake_ncc.FakeNCC(latency=args.latency, job_duration=0).start()
+    try:
+        results.append(bench_client_requests(fake, args.requests,
+                                             args.concurrency))
+        for entity_count in args.entities:
+            results.append(bench_provision_cycle(fake, entity_count,
+                                                 args.workers, args.repeat))
+        results.extend(bench_status_memory(fake, args.memory_entities,
+                                           args.memory_cycles))
+    finally:
+        fake.stop()
+    for pool_size in args.pool_sizes:
+        results.append(bench_payload_preparer(pool_size, args.repeat))
+    directory = tempfile.mkdtemp()
+    try:
+        certfile = _make_certificate(directory)
+        if certfile is None:
+            results.append(_result('nsclient_requests', None, 'requests/s',
+                                   scheme='https',
+                                   concurrency=args.concurrency,
+                                   skipped='openssl not available'))
+        else:
+            # The fake's certificate is self-signed.
+            ssl._create_default_https_context = (
+                ssl._create_unverified_context)
+            fake = fake_ncc.FakeNCC(latency=args.latency,
+                                    certfile=certfile).start()
+            try:
+                results.append(bench_client_requests(fake, args.requests,
+                                                     args.concurrency))
+            finally:
+                fake.stop()
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def compare(results, baseline):
+    def key(result):
+        return (result['name'], tuple(sorted(result['params'].items())))
+
+    previous = dict((key(result), result)
+                    for result in baseline.get('results', []))
+    for result in results:
+        old = previous.get(key(result))
+        params = ", ".join("%s=%s" % item
+                           for item in sorted(result['params'].items()))
+        if not old or not old['value'] or result['value'] is None:
+            change = "n/a"
+        else:
+            change = "%+.1f%%" % (
+                (result['value'] - old['value']) * 100.0 / old['value'])
+        print("%-34s %-45s %s" % (result['name'], params, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='file the JSON results are '
+                                         'written to, default stdout')
+    parser.add_argument('--compare', help='earlier results to compare to')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds of latency of the fake NCC')
+    parser.add_argument('--entities', type=int, nargs='+',
+                        default=list(ENTITY_COUNTS))
+    parser.add_argument('--workers', type=int, default=1,
+                        help='status_collection_workers of the cycles')
+    parser.add_argument('--pool-sizes', type=int, nargs='+',
+                        default=list(POOL_SIZES))
+    parser.add_argument('--memory-entities', type=int, default=1000)
+    parser.add_argument('--memory-cycles', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    results = run(args)
+    report = {'timestamp': time.time(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'results': results}
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,2 +1,5 @@
+from .metrics import *
 from .ncc_client import *
 from .netscaler_driver_v2 import *
+from .request_queue import *
+from .sharding import *
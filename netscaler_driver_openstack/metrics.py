@@ -0,0 +1,321 @@
+# Copyright 2015 Citrix Systems, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import errno
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DEFAULT_PREFIX = 'netscaler_lbaas'
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+
+class MetricsRegistry(object):
+
+    """In-memory counters, gauges and histograms of the driver.
+
+    Every metric is identified by its name and a set of labels. Values
+    are kept in memory, so snapshot() can be read at any time, and are
+    also handed to the configured emitters: record() of an emitter is
+    called for every value, flush() with the registry by the driver's
+    metrics timer.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.emitters = []
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def set_emitters(self, emitters):
+        self.emitters = list(emitters)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._record(COUNTER, name, value, labels)
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+        self._record(GAUGE, name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = _Histogram(self.buckets)
+                self._histograms[key] = histogram
+            histogram.observe(value)
+        self._record(HISTOGRAM, name, value, labels)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Observe the seconds spent in the with block."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, **labels)
+
+    def snapshot(self):
+        """Return a copy of all values.
+
+        The result maps 'counters', 'gauges' and 'histograms' to dicts
+        keyed by (name, labels), labels being a sorted tuple of
+        (label, value) pairs. Histograms are dicts with the cumulative
+        'buckets' as (upper bound, count) pairs, 'sum' and 'count'.
+        """
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': dict(
+                    (key, histogram.to_dict())
+                    for key, histogram in self._histograms.items()),
+            }
+
+    def flush(self):
+        for emitter in self.emitters:
+            try:
+                emitter.flush(self)
+            except Exception:
+                LOG.exception("error flushing metrics to %s",
+                              emitter.__class__.__name__)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def _record(self, kind, name, value, labels):
+        for emitter in self.emitters:
+            try:
+                emitter.record(kind, name, value, labels)
+            except Exception:
+                LOG.debug("error recording metric %s", name, exc_info=True)
+
+
+class MetricsEmitter(object):
+
+    """Base class of the metrics emitters, both hooks do nothing."""
+
+    def record(self, kind, name, value, labels):
+        pass
+
+    def flush(self, registry):
+        pass
+
+
+class StatsdEmitter(MetricsEmitter):
+
+    """Send every value to a statsd server over UDP.
+
+    Label values are appended to the metric name in sorted label order,
+    e.g. netscaler_lbaas.ncc_requests_total.GET.loadbalancers.200.
+    Histogram values are sent as timers in milliseconds.
+    """
+
+    def __init__(self, host, port, prefix=DEFAULT_PREFIX):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def record(self, kind, name, value, labels):
+        parts = [self.prefix, name]
+        parts.extend(_sanitize(labels[label]) for label in sorted(labels))
+        if kind == COUNTER:
+            line = "%s:%d|c" % (".".join(parts), value)
+        elif kind == GAUGE:
+            line = "%s:%s|g" % (".".join(parts), value)
+        else:
+            line = "%s:%.3f|ms" % (".".join(parts), value * 1000)
+        try:
+            self._socket.sendto(line.encode('utf-8'), self.address)
+        except socket.error:
+            # Metrics are best effort, a full buffer or an unreachable
+            # server must not slow down the driver.
+            pass
+
+
+class PrometheusTextfileEmitter(MetricsEmitter):
+
+    """Write all values in the Prometheus text format to a file.
+
+    The file is meant for the textfile collector of the node exporter
+    and is replaced atomically on every flush. Every process, e.g. each
+    neutron-server worker, writes a file of its own with its pid before
+    the extension of path, and labels its values with worker=<pid>.
+    Files of processes that are no longer running are removed.
+    """
+
+    def __init__(self, path, prefix=DEFAULT_PREFIX):
+        self.path = path
+        self.prefix = prefix
+
+    def get_path(self, pid):
+        root, ext = os.path.splitext(self.path)
+        return "%s.%d%s" % (root, pid, ext)
+
+    def flush(self, registry):
+        # Computed on every flush, a forked worker writes its own file.
+        pid = os.getpid()
+        path = self.get_path(pid)
+        directory = os.path.dirname(path) or os.curdir
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix=os.path.basename(path) + '.',
+            suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as metrics_file:
+                metrics_file.write(self.format(registry.snapshot(), pid))
+            # Readable by the node exporter, mkstemp creates it private.
+            os.chmod(tmp_path, 0o644)
+            os.rename(tmp_path, path)
+        except Exception:
+            _remove(tmp_path)
+            raise
+        self._remove_stale_files(directory)
+
+    def _remove_stale_files(self, directory):
+        root, ext = os.path.splitext(os.path.basename(self.path))
+        pattern = re.compile(r'^%s\.(\d+)%s$' % (re.escape(root),
+                                                 re.escape(ext)))
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match and not _is_alive(int(match.group(1))):
+                _remove(os.path.join(directory, name))
+
+    def format(self, snapshot, worker=None):
+        worker_labels = ()
+        if worker is not None:
+            worker_labels = (('worker', str(worker)),)
+        lines = []
+        for kind, values in ((COUNTER, snapshot['counters']),
+                             (GAUGE, snapshot['gauges'])):
+            for name, items in _group_by_name(values):
+                name = "%s_%s" % (self.prefix, name)
+                lines.append("# TYPE %s %s" % (name, kind))
+                for labels, value in items:
+                    lines.append("%s%s %s" % (
+                        name, _format_labels(labels + worker_labels),
+                        value))
+        for name, items in _group_by_name(snapshot['histograms']):
+            name = "%s_%s" % (self.prefix, name)
+            lines.append("# TYPE %s histogram" % name)
+            for labels, histogram in items:
+                labels += worker_labels
+                for upper_bound, count in histogram['buckets']:
+                    bucket_labels = labels + (('le', upper_bound),)
+                    lines.append("%s_bucket%s %d" % (
+                        name, _format_labels(bucket_labels), count))
+                lines.append("%s_sum%s %s" % (name, _format_labels(labels),
+                                              histogram['sum']))
+                lines.append("%s_count%s %d" % (
+                    name, _format_labels(labels), histogram['count']))
+        return "\n".join(lines) + "\n"
+
+
+class _Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        buckets = []
+        total = 0
+        for upper_bound, count in zip(self.buckets + ('+Inf',),
+                                      self.counts):
+            total += count
+            buckets.append((upper_bound, total))
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+def _label_key(labels):
+    return tuple(sorted((label, str(value))
+                        for label, value in labels.items()))
+
+
+def _sanitize(value):
+    return re.sub(r'[^A-Za-z0-9_-]', '_', str(value))
+
+
+def _group_by_name(values):
+    groups = {}
+    for (name, labels), value in values.items():
+        groups.setdefault(name, []).append((labels, value))
+    return sorted((name, sorted(items, key=lambda item: item[0]))
+                  for name, items in groups.items())
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(
+        '%s="%s"' % (label, str(value).replace('\\', '\\\\')
+                     .replace('"', '\\"')) for label, value in labels)
+
+
+# Shared by the NSClient instances and the driver of a process.
+METRICS = MetricsRegistry()
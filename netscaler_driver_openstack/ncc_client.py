@@ -12,14 +12,28 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import errno
 import httplib
+import itertools
+import json
+import os
+import random
+import re
+import select
+import socket
+import threading
+import time
 from urlparse import urlparse
 from neutron.common import exceptions as n_exc
 from neutron.i18n import _LE
 from neutron.i18n import _LI
+from neutron.i18n import _LW
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import metrics
+
 LOG = logging.getLogger(__name__)
 
 CONTENT_TYPE_HEADER = 'Content-type'
@@ -30,6 +44,48 @@ TENANT_HEADER = 'X-Tenant-ID'
 JSON_CONTENT_TYPE = 'application/json'
 DRIVER_HEADER_VALUE = 'netscaler-openstack-lbaas'
 NITRO_LOGIN_URI = 'nitro/v2/config/login'
+DEFAULT_CONNECTION_POOL_SIZE = 10
+DEFAULT_CONNECTION_IDLE_TIMEOUT = 60
+DEFAULT_SESSION_TIMEOUT = 1800
+DEFAULT_MAX_LOGIN_RETRIES = 2
+DEFAULT_REQUEST_LOG_SAMPLING = 0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.5
+DEFAULT_RETRY_MAX_BACKOFF = 5
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5
+DEFAULT_CIRCUIT_RESET_TIMEOUT = 30
+LOGIN_OPERATION = 'login'
+CRUD_OPERATION = 'crud'
+STATUS_OPERATION = 'status'
+NCCTimeouts = collections.namedtuple('NCCTimeouts',
+                                     ['connect', 'read', 'deadline'])
+# Seconds to connect, to wait for a response and for the whole operation
+# including retries, by operation class.
+DEFAULT_TIMEOUTS = {
+    LOGIN_OPERATION: NCCTimeouts(5, 30, 60),
+    CRUD_OPERATION: NCCTimeouts(5, 60, 120),
+    STATUS_OPERATION: NCCTimeouts(5, 10, 20),
+}
+# Methods whose requests can be sent again without changing the outcome.
+IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE')
+# Responses of an NCC that is overloaded or behind an unavailable proxy.
+UNAVAILABLE_STATUSES = (httplib.BAD_GATEWAY, httplib.SERVICE_UNAVAILABLE,
+                        httplib.GATEWAY_TIMEOUT)
+# Errors of a request on a keep-alive socket that NCC closed while idle.
+STALE_CONNECTION_ERRNOS = (errno.ECONNRESET, errno.EPIPE,
+                           errno.ECONNABORTED)
+# Sessions are renewed once this fraction of their lifetime has passed.
+SESSION_REFRESH_RATIO = 0.9
+# Seconds between attempts to take a lock that may only be waited for
+# until a deadline.
+LOCK_POLL_INTERVAL = 0.01
+
+UUID_PATTERN = re.compile(
+    r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-'
+    r'[0-9a-fA-F]{12}$')
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
 
 
 class NCCException(n_exc.NeutronException):
@@ -53,38 +109,215 @@ class NCCException(n_exc.NeutronException):
             return True
 
 
-class NSClient(object):
-
-    """Client to operate on REST resources of NetScaler Control Center."""
+class NCCConnectError(socket.error):
+
+    """The connection to NCC failed before any request data was sent."""
+
+
+class NCCConnectionPool(object):
+
+    """Pool of persistent HTTP/1.1 connections to one NCC endpoint.
+
+    At most pool_size idle connections are kept. Connections idle for
+    longer than idle_timeout seconds, or whose socket was closed by the
+    peer, are dropped instead of being handed out again. A process forked
+    after the pool was filled starts with an empty pool of its own.
+    """
+
+    def __init__(self, protocol, host, port,
+                 pool_size=DEFAULT_CONNECTION_POOL_SIZE,
+                 idle_timeout=DEFAULT_CONNECTION_IDLE_TIMEOUT):
+        self.protocol = protocol.lower()
+        self.host = host
+        self.port = int(port)
+        self.pool_size = int(pool_size)
+        self.idle_timeout = float(idle_timeout)
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def new_connection(self, timeout):
+        if self.protocol == 'http':
+            return httplib.HTTPConnection(self.host, port=self.port,
+                                          timeout=timeout)
+        elif self.protocol == 'https':
+            return httplib.HTTPSConnection(self.host, port=self.port,
+                                           timeout=timeout)
+        LOG.error(_LE("Protocol should be either http or https"))
+        raise NCCException(NCCException.CONFIG_ERROR)
+
+    def get(self, timeout):
+        """Return (connection, reused) for a single request."""
+        stale = []
+        connection = None
+        now = time.time()
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked API worker: the idle sockets belong to the parent.
+                self._idle.clear()
+                self._pid = os.getpid()
+            while self._idle:
+                candidate, last_used = self._idle.pop()
+                if (now - last_used < self.idle_timeout and
+                        not self._is_dropped(candidate)):
+                    connection = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        if connection is None:
+            return self.new_connection(timeout), False
+        connection.timeout = timeout
+        connection.sock.settimeout(timeout)
+        return connection, True
+
+    def put(self, connection):
+        """Give back a connection whose response was read completely."""
+        with self._lock:
+            if connection.sock and len(self._idle) < self.pool_size:
+                self._idle.append((connection, time.time()))
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection, __ in idle:
+            connection.close()
 
-    def __init__(self, service_uri, username, password,
-                 ncc_cleanup_mode="False"):
-        if not service_uri:
-            LOG.exception(_LE("No NetScaler Control Center URI specified. "
-                              "Cannot connect."))
-            raise NCCException(NCCException.CONNECTION_ERROR)
+    def _is_dropped(self, connection):
+        # An idle keep-alive socket is readable only when the peer has
+        # closed it (or sent garbage), either way it cannot be reused.
+        sock = connection.sock
+        if sock is None:
+            return True
+        try:
+            readable, __, __ = select.select([sock], [], [], 0)
+        except (select.error, socket.error, ValueError):
+            return True
+        return bool(readable)
+
+
+class NCCCircuitBreaker(object):
+
+    """Fails requests fast while an NCC endpoint is unhealthy.
+
+    The breaker opens after failure_threshold consecutive failed
+    requests, and requests are then rejected without being sent. A
+    background thread calls probe() every reset_timeout seconds and
+    closes the breaker as soon as it succeeds. A failure_threshold of 0
+    disables the breaker. endpoint names the NCC in logs and metrics.
+    """
+
+    def __init__(self, probe,
+                 failure_threshold=DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_CIRCUIT_RESET_TIMEOUT,
+                 endpoint=''):
+        self.probe = probe
+        self.endpoint = endpoint
+        self.failure_threshold = int(failure_threshold)
+        self.reset_timeout = float(reset_timeout)
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        return self.opened_at is not None
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self.failures += 1
+            if (self.opened_at is not None or
+                    self.failures < self.failure_threshold):
+                return
+            self.opened_at = time.time()
+        LOG.error(_LE("NetScaler Control Center %(endpoint)s unavailable "
+                      "after %(failures)d failed requests, failing requests "
+                      "until it recovers"),
+                  {"endpoint": self.endpoint, "failures": self.failures})
+        metrics.METRICS.set_gauge('ncc_circuit_open', 1,
+                                  endpoint=self.endpoint)
+        prober = threading.Thread(target=self._run_probe)
+        prober.daemon = True
+        prober.start()
+
+    def _run_probe(self):
+        while True:
+            time.sleep(self.reset_timeout)
+            try:
+                self.probe()
+            except Exception:
+                LOG.debug("NetScaler Control Center %s probe failed",
+                          self.endpoint, exc_info=True)
+                continue
+            with self._lock:
+                self.failures = 0
+                self.opened_at = None
+            LOG.info(_LI("NetScaler Control Center %s reachable again"),
+                     self.endpoint)
+            metrics.METRICS.set_gauge('ncc_circuit_open', 0,
+                                      endpoint=self.endpoint)
+            return
+
+
+class NCCEndpoint(object):
+
+    """One node of NetScaler Control Center.
+
+    Every node has its own connection pool, circuit breaker and login
+    session, so a failing node does not affect requests to the others.
+    """
+
+    def __init__(self, service_uri,
+                 connection_pool_size=DEFAULT_CONNECTION_POOL_SIZE,
+                 connection_idle_timeout=DEFAULT_CONNECTION_IDLE_TIMEOUT,
+                 circuit_failure_threshold=DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+                 circuit_reset_timeout=DEFAULT_CIRCUIT_RESET_TIMEOUT):
         self.service_uri = service_uri.strip('/')
         self.auth = None
-        self.cleanup_mode = False
-        if username and password:
-            self.username = username
-            self.password = password
-        if ncc_cleanup_mode.lower() == "true":
-            self.cleanup_mode = True
+        self.auth_time = None
+        self.login_lock = threading.Lock()
         self.parse_uri(self.service_uri)
-
-    def get_connection(self, timeout=1000):
-        host = self.endpoint_host
-        port = int(self.endpoint_port)
-        protocol = self.protocol 
-        if protocol.lower() == 'http':
-            connection = httplib.HTTPConnection(host, port=port, timeout=int(timeout))
-        elif protocol.lower() == 'https':
-            connection = httplib.HTTPSConnection(host, port=port, timeout=int(timeout))
-        else:
-            LOG.error(_LE("Protocol should be either http or https"))
-            NCCException(NCCException.CONFIG_ERROR)
-        return connection
+        self.connection_pool = NCCConnectionPool(self.protocol,
+                                                 self.endpoint_host,
+                                                 self.endpoint_port,
+                                                 connection_pool_size,
+                                                 connection_idle_timeout)
+        self.circuit_breaker = NCCCircuitBreaker(
+            self.probe, circuit_failure_threshold, circuit_reset_timeout,
+            endpoint="%s:%s" % (self.endpoint_host, self.endpoint_port))
+
+    def __repr__(self):
+        return "<NCCEndpoint %s>" % self.service_uri
+
+    def is_available(self):
+        return not self.circuit_breaker.is_open()
+
+    def probe(self):
+        """Check that NCC itself answers, not just its TCP port.
+
+        A proxy in front of an unavailable NCC accepts connections, so an
+        unauthenticated GET of the login resource is sent. Any answer but
+        an unavailable status, e.g. 401, shows that NCC is up again.
+        """
+        connection = self.connection_pool.new_connection(
+            self.circuit_breaker.reset_timeout)
+        try:
+            connection.request('GET', "/%s" % NITRO_LOGIN_URI,
+                               headers={ACCEPT_HEADER: JSON_CONTENT_TYPE})
+            response = connection.getresponse()
+            response.read()
+        finally:
+            connection.close()
+        if response.status in UNAVAILABLE_STATUSES:
+            raise NCCException(NCCException.CONNECTION_ERROR,
+                               response.status)
 
     def parse_uri(self, service_uri):
         self.parts = urlparse(service_uri)
@@ -121,9 +354,233 @@ class NSClient(object):
             raise NCCException(NCCException.CONFIG_ERROR)
 
         LOG.info(_LI("RestClient using endpoint %(host)s:%(port)s"), {
-             "host": self.endpoint_host, "port": self.endpoint_port})            
+             "host": self.endpoint_host, "port": self.endpoint_port})
+
+
+def split_service_uri(service_uri):
+    """Return the NCC node URIs of a comma separated service URI."""
+    return [uri.strip().strip('/') for uri in (service_uri or '').split(',')
+            if uri.strip()]
+
+
+def get_client(service_uri, username, password, ncc_cleanup_mode="False",
+               **kwargs):
+    """Return the NSClient shared by every caller of the same NCC endpoints.
+
+    Keyword arguments are passed to NSClient when the client is created.
+    """
+    key = (",".join(split_service_uri(service_uri)), username,
+           str(ncc_cleanup_mode).lower())
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = NSClient(service_uri, username, password,
+                              ncc_cleanup_mode, **kwargs)
+            _CLIENTS[key] = client
+    return client
+
+
+class NCCResponse(object):
+
+    """Response of an NCC request whose JSON body is decoded on demand.
+
+    The body is decoded at most once, the first time the 'dict' is
+    read, and only for successful responses. Paged listings can be
+    decoded item by item with iter_items() instead. For compatibility
+    the response can still be read like the dict NSClient used to
+    return, with the 'status', 'body', 'headers' and 'dict' keys.
+    """
+
+    _KEYS = ('status', 'body', 'headers', 'dict')
+    _DECODER = json.JSONDecoder()
+    _WHITESPACE = re.compile(r'\s*')
+
+    def __init__(self, status, body, headers):
+        self.status = int(status)
+        self.body = body
+        self.headers = headers
+        self._dict = None
+
+    @property
+    def dict(self):
+        if self._dict is None:
+            self._dict = {}
+            if self.status < httplib.BAD_REQUEST and self.body:
+                self._dict = jsonutils.loads(self.body)
+        return self._dict
+
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self._KEYS
+
+    def get(self, key, default=None):
+        if key not in self._KEYS:
+            return default
+        return getattr(self, key)
+
+    def iter_items(self, collection):
+        """Yield the items of the top level list named collection.
+
+        Items are decoded one at a time from the body, the listing is
+        never built as a whole. If the dict was decoded already its list
+        is used instead.
+        """
+        if self._dict is not None:
+            for item in self._dict.get(collection) or []:
+                yield item
+            return
+        if self.status >= httplib.BAD_REQUEST or not self.body:
+            return
+        body = self.body
+        if isinstance(body, bytes) and not isinstance(body, str):
+            # Python 3 bytes; on Python 2 raw_decode reads the str body
+            # as it is, without a decoded copy of the whole listing.
+            body = body.decode('utf-8')
+        index = self._skip(body, 0)
+        if body[index:index + 1] != '{':
+            return
+        index = self._skip(body, index + 1)
+        while body[index:index + 1] == '"':
+            key, index = self._DECODER.raw_decode(body, index)
+            index = self._skip(body, self._skip(body, index) + 1)
+            if key != collection:
+                # Other members of a listing are small, e.g. counts.
+                __, index = self._DECODER.raw_decode(body, index)
+                index = self._skip(body, index)
+                if body[index:index + 1] == ',':
+                    index = self._skip(body, index + 1)
+                continue
+            if body[index:index + 1] != '[':
+                return
+            index = self._skip(body, index + 1)
+            while body[index:index + 1] not in (']', ''):
+                item, index = self._DECODER.raw_decode(body, index)
+                yield item
+                index = self._skip(body, index)
+                if body[index:index + 1] == ',':
+                    index = self._skip(body, index + 1)
+            return
+
+    def _skip(self, body, index):
+        return self._WHITESPACE.match(body, index).end()
+
+
+def is_stale_connection_error(error):
+    """Tell whether error means NCC closed an idle keep-alive connection.
+
+    These are a reset or closed socket and an empty status line. Read
+    timeouts and errors after part of the response was read are not, as
+    NCC may have processed the request.
+    """
+    if isinstance(error, httplib.BadStatusLine):
+        # Python 2.7.15 and later report the empty line with a message.
+        return (not error.line or error.line == "''" or
+                error.line.startswith("No status line received"))
+    if isinstance(error, socket.timeout):
+        return False
+    if isinstance(error, socket.error):
+        return error.errno in STALE_CONNECTION_ERRNOS
+    return False
+
+
+def get_resource_type(resource_uri):
+    """Return the resource type a NCC request URI operates on.
+
+    This is the last path segment that is not an object id, e.g.
+    members for /v2.0/lbaas/pools/<id>/members/<id>.
+    """
+    segments = resource_uri.split('?', 1)[0].strip('/').split('/')
+    for segment in reversed(segments):
+        if segment and not UUID_PATTERN.match(segment):
+            return segment
+    return 'unknown'
+
+
+class NSClient(object):
+
+    """Client to operate on REST resources of NetScaler Control Center.
+
+    service_uri is the URI of one NCC node, or a comma separated list of
+    the nodes of an NCC HA pair or cluster. GET requests are spread round
+    robin across the nodes whose circuit breaker is closed. Requests that
+    change state go to the active node, the first one initially; when it
+    becomes unavailable they fail over to the next available node, which
+    then stays active.
+    """
+
+    def __init__(self, service_uri, username, password,
+                 ncc_cleanup_mode="False",
+                 connection_pool_size=DEFAULT_CONNECTION_POOL_SIZE,
+                 connection_idle_timeout=DEFAULT_CONNECTION_IDLE_TIMEOUT,
+                 session_timeout=DEFAULT_SESSION_TIMEOUT,
+                 max_login_retries=DEFAULT_MAX_LOGIN_RETRIES,
+                 request_log_sampling=DEFAULT_REQUEST_LOG_SAMPLING,
+                 max_retries=DEFAULT_MAX_RETRIES,
+                 retry_backoff=DEFAULT_RETRY_BACKOFF,
+                 retry_max_backoff=DEFAULT_RETRY_MAX_BACKOFF,
+                 circuit_failure_threshold=DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+                 circuit_reset_timeout=DEFAULT_CIRCUIT_RESET_TIMEOUT,
+                 timeouts=None):
+        if not service_uri:
+            LOG.exception(_LE("No NetScaler Control Center URI specified. "
+                              "Cannot connect."))
+            raise NCCException(NCCException.CONNECTION_ERROR)
+        self.service_uri = ",".join(split_service_uri(service_uri))
+        self.session_timeout = int(session_timeout)
+        self.max_login_retries = int(max_login_retries)
+        self.request_log_sampling = int(request_log_sampling)
+        self._request_count = itertools.count(1)
+        self.max_retries = int(max_retries)
+        self.retry_backoff = float(retry_backoff)
+        self.retry_max_backoff = float(retry_max_backoff)
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.cleanup_mode = False
+        if username and password:
+            self.username = username
+            self.password = password
+        if ncc_cleanup_mode.lower() == "true":
+            self.cleanup_mode = True
+        self.endpoints = [
+            NCCEndpoint(uri, connection_pool_size, connection_idle_timeout,
+                        circuit_failure_threshold, circuit_reset_timeout)
+            for uri in split_service_uri(service_uri)]
+        self.active_endpoint = self.endpoints[0]
+        self._read_count = itertools.count()
+
+    def get_connection(self, timeout=None):
+        if timeout is None:
+            timeout = self.timeouts[CRUD_OPERATION].connect
+        return self.active_endpoint.connection_pool.new_connection(
+            float(timeout))
+
+    def _get_endpoints(self, method):
+        """Return the available endpoints to send a request to, in order."""
+        if method == 'GET':
+            available = [endpoint for endpoint in self.endpoints
+                         if endpoint.is_available()]
+            if not available:
+                return available
+            start = next(self._read_count) % len(available)
+            return available[start:] + available[:start]
+        start = self.endpoints.index(self.active_endpoint)
+        ordered = self.endpoints[start:] + self.endpoints[:start]
+        return [endpoint for endpoint in ordered if endpoint.is_available()]
+
+    def _set_active_endpoint(self, endpoint):
+        if endpoint is self.active_endpoint:
+            return
+        LOG.warning(_LW("NetScaler Control Center %(old)s unavailable, "
+                        "failing over to %(new)s"),
+                    {"old": self.active_endpoint.service_uri,
+                     "new": endpoint.service_uri})
+        metrics.METRICS.increment('ncc_failovers_total')
+        self.active_endpoint = endpoint
 
-            
     def create_resource(self, tenant_id, resource_path, object_name,
                         object_data):
         """Create a resource of NetScaler Control Center."""
@@ -138,14 +595,20 @@ class NSClient(object):
         else:
             return False
 
-    def login(self):
+    def login(self, endpoint=None, deadline=None):
         """Get session based login"""
+        endpoint = endpoint or self.active_endpoint
         login_obj = {"username": self.username, "password": self.password}
 
-        msg = "NetScaler driver login:" + repr(login_obj)
-        LOG.info(msg)
-        resp_status, result = self.create_resource("login", NITRO_LOGIN_URI,
-                                                   "login", login_obj)
+        LOG.info(_LI("NetScaler driver login: %(username)s on %(uri)s"),
+                 {"username": self.username, "uri": endpoint.service_uri})
+        try:
+            resp_status, result = self._resource_operation(
+                'POST', "login", NITRO_LOGIN_URI, object_name="login",
+                object_data=login_obj, endpoint=endpoint, deadline=deadline)
+        except Exception:
+            metrics.METRICS.increment('ncc_logins_total', result='failed')
+            raise
         LOG.info(_LI("Response: status : %(status)s %(result)s"), {
                  "status": resp_status, "result": result['body']})
         session_id = None
@@ -161,17 +624,57 @@ class NSClient(object):
                 
         if session_id:
             LOG.info(_LI("Response: %(result)s"), {"result": result['body']})
-            LOG.info(
-                _LI("Session_id = %(session_id)s") %
-                {"session_id": session_id})
+            LOG.info(_LI("Session_id = %(session_id)s"),
+                     {"session_id": session_id})
             # Update sessin_id in auth
-            self.auth = "SessId=%s" % session_id
+            endpoint.auth = "SessId=%s" % session_id
+            endpoint.auth_time = time.time()
+            metrics.METRICS.increment('ncc_logins_total', result='success')
         else:
+            metrics.METRICS.increment('ncc_logins_total', result='failed')
             raise NCCException(NCCException.RESPONSE_ERROR)
 
-    def retrieve_resource(self, tenant_id, resource_path, parse_response=True):
-        """Retrieve a resource of NetScaler Control Center."""
-        return self._resource_operation('GET', tenant_id, resource_path)
+    def _renew_session(self, endpoint, stale_auth, deadline=None):
+        """Log in again unless another caller already replaced stale_auth.
+
+        Only one login per endpoint runs at a time; callers that queued up
+        behind it reuse the session it obtained instead of logging in
+        themselves. Neither the wait nor the login run past deadline.
+        """
+        if not _acquire(endpoint.login_lock, deadline):
+            LOG.error(_LE("Deadline exceeded waiting for the login to %s"),
+                      endpoint.service_uri)
+            raise NCCException(NCCException.CONNECTION_ERROR,
+                               httplib.GATEWAY_TIMEOUT)
+        try:
+            if endpoint.auth is not None and endpoint.auth != stale_auth:
+                return
+            self.login(endpoint, deadline)
+        finally:
+            endpoint.login_lock.release()
+
+    def _ensure_session(self, endpoint, deadline=None):
+        if not endpoint.auth:
+            # Creating a session for the first time
+            self._renew_session(endpoint, None, deadline)
+        elif self._is_session_expiring(endpoint):
+            self._renew_session(endpoint, endpoint.auth, deadline)
+
+    def _is_session_expiring(self, endpoint):
+        if not endpoint.auth_time:
+            return False
+        session_age = time.time() - endpoint.auth_time
+        return session_age > self.session_timeout * SESSION_REFRESH_RATIO
+
+    def retrieve_resource(self, tenant_id, resource_path, parse_response=True,
+                          operation=CRUD_OPERATION):
+        """Retrieve a resource of NetScaler Control Center.
+
+        operation is the class whose timeouts apply, STATUS_OPERATION for
+        status and statistics polling.
+        """
+        return self._resource_operation('GET', tenant_id, resource_path,
+                                        operation=operation)
 
     def update_resource(self, tenant_id, resource_path, object_name,
                         object_data):
@@ -181,19 +684,22 @@ class NSClient(object):
                                         object_name=object_name,
                                         object_data=object_data)
 
-    def remove_resource(self, tenant_id, resource_path, parse_response=True):
+    def remove_resource(self, tenant_id, resource_path, parse_response=True,
+                        object_name=None, object_data=None):
         """Remove a resource of NetScaler Control Center."""
         if self.cleanup_mode:
             return True
         else:
-            return self._resource_operation('DELETE', tenant_id, resource_path)
+            return self._resource_operation('DELETE', tenant_id,
+                                            resource_path,
+                                            object_name=object_name,
+                                            object_data=object_data)
 
     def _resource_operation(self, method, tenant_id, resource_path,
-                            object_name=None, object_data=None):
+                            object_name=None, object_data=None,
+                            endpoint=None, operation=CRUD_OPERATION,
+                            deadline=None):
         resource_uri = "/%s" % (resource_path)
-        if not self.auth and not self.is_login(resource_uri):
-            # Creating a session for the first time
-            self.login()
         headers = self._setup_req_headers(tenant_id)
 #         LOG.error(_LE("Request: headers : %(headers)s"), {
 #          "headers": repr(headers)})
@@ -210,7 +716,10 @@ class NSClient(object):
                                           _execute_request(method,
                                                            resource_uri,
                                                            headers,
-                                                           body=request_body))
+                                                           body=request_body,
+                                                           endpoint=endpoint,
+                                                           operation=operation,
+                                                           deadline=deadline))
         except NCCException as e:
             if e.status == httplib.NOT_FOUND and method == 'DELETE':
                 return 200, {}
@@ -228,59 +737,252 @@ class NSClient(object):
                    CONTENT_TYPE_HEADER: JSON_CONTENT_TYPE,
                    DRIVER_HEADER: DRIVER_HEADER_VALUE,
                    TENANT_HEADER: tenant_id,
-                   AUTH_HEADER: self.auth}
+                   AUTH_HEADER: None}
         return headers
 
     def _get_response_dict(self, response):
-        
-        response_dict = {'status': int(response.status),
-                         'body': response.read(),
-                         'headers': response.getheaders(),
-                         'dict':{}}
-        
-#         LOG.error(_LE("Response: headers : %(response)s status %(status)s"), {
-#                  "response": repr(response_dict["headers"]), "status": response_dict['status'] })
-        if self._is_valid_response(response_dict['status']):
-            if response_dict['body']:
-                response_dict['dict'] = jsonutils.loads(response_dict['body'])
-        return response_dict
-
-    def _execute_request(self, method, resource_uri, headers, body=None):
-        service_uri_dict = {"service_uri": self.service_uri}
+        return NCCResponse(response.status, response.read(),
+                           response.getheaders())
+
+    def _get_timeouts(self, operation, resource_uri):
+        if self.is_login(resource_uri):
+            return self.timeouts[LOGIN_OPERATION]
+        return self.timeouts[operation]
+
+    def _send_request(self, endpoint, method, resource_uri, headers, body,
+                      connect_timeout, read_timeout, deadline):
+        start = time.time()
+        resource_type = get_resource_type(resource_uri)
+        status = 'error'
         try:
-#             LOG.error(_LE("Request: \nmethod : %(method)s\n uri: %(uri)s\n body: %(body)s"), {
-#                  "method": method, "uri": resource_uri, "body": body})
-            connection = self.get_connection()
-            connection.request(method, resource_uri, body=body, headers=headers)
-            response = connection.getresponse()
-            resp_dict = self._get_response_dict(response)
+            connection, reused = endpoint.connection_pool.get(connect_timeout)
+            metrics.METRICS.increment('ncc_connections_total',
+                                      reused=str(reused).lower())
+            try:
+                response, resp_dict = self._request_on(connection, method,
+                                                       resource_uri, headers,
+                                                       body, read_timeout)
+            except (httplib.HTTPException, socket.error) as e:
+                remaining = deadline - time.time()
+                if (not reused or method not in IDEMPOTENT_METHODS or
+                        not is_stale_connection_error(e) or remaining <= 0):
+                    raise
+                # NCC closed the keep-alive socket after the liveness check
+                # in the pool, retry once on a fresh connection.
+                metrics.METRICS.increment('ncc_request_retries_total',
+                                          method=method, reason='reconnect')
+                connection = endpoint.connection_pool.new_connection(
+                    min(connect_timeout, remaining))
+                reused = False
+                metrics.METRICS.increment('ncc_connections_total',
+                                          reused='false')
+                response, resp_dict = self._request_on(
+                    connection, method, resource_uri, headers, body,
+                    min(read_timeout, remaining))
+            status = resp_dict['status']
+        finally:
+            duration = time.time() - start
+            metrics.METRICS.observe('ncc_request_duration_seconds', duration,
+                                    method=method, resource=resource_type)
+            metrics.METRICS.increment('ncc_requests_total', method=method,
+                                      resource=resource_type, status=status)
+        if response.will_close:
             connection.close()
+        else:
+            endpoint.connection_pool.put(connection)
+        if self._is_request_sampled():
+            self._log_request(endpoint, method, resource_uri, resp_dict,
+                              duration, reused)
+        return resp_dict
+
+    def _is_request_sampled(self):
+        if (not self.request_log_sampling or
+                not LOG.isEnabledFor(logging.DEBUG)):
+            return False
+        return next(self._request_count) % self.request_log_sampling == 0
+
+    def _log_request(self, endpoint, method, resource_uri, resp_dict,
+                     duration, reused):
+        # One key=value line per request, easy to filter and aggregate.
+        LOG.debug("ncc_request endpoint=%(endpoint)s method=%(method)s "
+                  "uri=%(uri)s status=%(status)d duration_ms=%(duration).1f "
+                  "response_bytes=%(bytes)d reused_connection=%(reused)s",
+                  {"endpoint": endpoint.circuit_breaker.endpoint,
+                   "method": method,
+                   "uri": resource_uri.split('?', 1)[0],
+                   "status": resp_dict['status'],
+                   "duration": duration * 1000,
+                   "bytes": len(resp_dict.body or ''),
+                   "reused": reused})
+
+    def _request_on(self, connection, method, resource_uri, headers, body,
+                    read_timeout):
+        try:
+            if connection.sock is None:
+                try:
+                    connection.connect()
+                except Exception as e:
+                    raise NCCConnectError(str(e))
+            connection.sock.settimeout(read_timeout)
+            connection.request(method, resource_uri, body=body,
+                               headers=headers)
+            response = connection.getresponse()
+            return response, self._get_response_dict(response)
         except Exception:
-            LOG.exception(
-                _LE("An exception occurred during request to"
-                    " %(service_uri)s"), service_uri_dict)
-            raise NCCException(NCCException.UNKNOWN_ERROR)
+            connection.close()
+            raise
+
+    def _send_with_retries(self, method, resource_uri, headers, body,
+                           timeouts, deadline, endpoint=None):
+        """Send a request, retrying failures that are safe to retry.
+
+        Requests that failed to connect are retried for every method,
+        requests that failed later, or were answered with an unavailable
+        status, only for idempotent methods. Retries go to the next
+        available endpoint not tried yet, if any, and wait a random time
+        of up to retry_backoff * 2 ** attempt seconds, capped at
+        retry_max_backoff. No attempt runs past deadline, the timeouts of
+        the last one are shortened to fit. Requests for endpoint are only
+        sent to it, e.g. logins.
+
+        Return (endpoint, session, response) of the last attempt.
+        """
+        attempt = 0
+        tried = []
+        while True:
+            if endpoint is not None:
+                endpoints = [endpoint] if endpoint.is_available() else []
+            else:
+                endpoints = self._get_endpoints(method)
+            if not endpoints:
+                metrics.METRICS.increment('ncc_requests_rejected_total',
+                                          method=method)
+                raise NCCException(NCCException.CONNECTION_ERROR)
+            untried = [e for e in endpoints if e not in tried]
+            current = (untried or endpoints)[0]
+            tried.append(current)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                LOG.error(_LE("Deadline of %(method)s %(uri)s exceeded"),
+                          {"method": method, "uri": resource_uri})
+                raise NCCException(NCCException.CONNECTION_ERROR,
+                                   httplib.GATEWAY_TIMEOUT)
+            error = None
+            session = None
+            try:
+                if not self.is_login(resource_uri):
+                    self._ensure_session(current, deadline)
+                    session = current.auth
+                    headers = dict(headers)
+                    headers[AUTH_HEADER] = session
+                    # The login took part of the time left.
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise NCCException(NCCException.CONNECTION_ERROR,
+                                           httplib.GATEWAY_TIMEOUT)
+                resp_dict = self._send_request(
+                    current, method, resource_uri, headers, body,
+                    min(timeouts.connect, remaining),
+                    min(timeouts.read, remaining), deadline)
+            except NCCConnectError as e:
+                error = e
+                retry = True
+            except NCCException as e:
+                # The login to current failed, another endpoint may work
+                # unless the credentials were rejected.
+                if (e.error != NCCException.CONNECTION_ERROR and
+                        e.status not in UNAVAILABLE_STATUSES):
+                    raise
+                error = e
+                retry = True
+            except (httplib.HTTPException, socket.error) as e:
+                error = e
+                retry = method in IDEMPOTENT_METHODS
+            else:
+                if resp_dict['status'] not in UNAVAILABLE_STATUSES:
+                    current.circuit_breaker.record_success()
+                    if endpoint is None and method != 'GET':
+                        self._set_active_endpoint(current)
+                    return current, session, resp_dict
+                retry = method in IDEMPOTENT_METHODS
+            if not isinstance(error, NCCException):
+                # A failed login was already counted by its own request.
+                current.circuit_breaker.record_failure()
+            delay = random.uniform(0, min(self.retry_max_backoff,
+                                          self.retry_backoff * 2 ** attempt))
+            if (not retry or attempt >= self.max_retries or
+                    time.time() + delay >= deadline):
+                if error is not None:
+                    raise error
+                return current, session, resp_dict
+            attempt += 1
+            metrics.METRICS.increment('ncc_request_retries_total',
+                                      method=method, reason='unavailable')
+            LOG.debug("retrying %(method)s %(uri)s in %(delay).2f seconds, "
+                      "attempt %(attempt)d failed on %(endpoint)s",
+                      {"method": method, "uri": resource_uri,
+                       "delay": delay, "attempt": attempt,
+                       "endpoint": current.service_uri})
+            time.sleep(delay)
+
+    def _execute_request(self, method, resource_uri, headers, body=None,
+                         endpoint=None, operation=CRUD_OPERATION,
+                         deadline=None):
+        """Send a request and return (status, NCCResponse).
+
+        The request ends at the deadline of its operation class, or at
+        deadline if that is earlier, e.g. for the login of a request.
+        """
+        service_uri_dict = {"service_uri": self.service_uri}
+        login_retries = 0
+        timeouts = self._get_timeouts(operation, resource_uri)
+        own_deadline = time.time() + timeouts.deadline
+        deadline = min(deadline or own_deadline, own_deadline)
+        while True:
+            try:
+                current, session, resp_dict = self._send_with_retries(
+                    method, resource_uri, headers, body, timeouts, deadline,
+                    endpoint)
+            except NCCException:
+                raise
+            except NCCConnectError as e:
+                # Callers, e.g. a request waiting for this login, can try
+                # another endpoint.
+                LOG.error(_LE("Unable to connect to %(service_uri)s: "
+                              "%(error)s"),
+                          {"service_uri": (endpoint.service_uri if endpoint
+                                           else self.service_uri),
+                           "error": e})
+                raise NCCException(NCCException.CONNECTION_ERROR)
+            except Exception:
+                LOG.exception(
+                    _LE("An exception occurred during request to"
+                        " %(service_uri)s"), service_uri_dict)
+                raise NCCException(NCCException.UNKNOWN_ERROR)
+
+            response_status = resp_dict['status']
+            if response_status != httplib.UNAUTHORIZED:
+                break
+            if self.is_login(resource_uri):
+                LOG.error(_LE("Unable to login. Invalid credentials passed"
+                              "for: %s"), current.service_uri)
+                raise NCCException(NCCException.RESPONSE_ERROR,
+                                   response_status)
+            if login_retries >= self.max_login_retries:
+                LOG.error(_LE("Unable to login. Session rejected after "
+                              "%(retries)d logins for: %(service_uri)s"),
+                          {"retries": login_retries,
+                           "service_uri": current.service_uri})
+                raise NCCException(NCCException.RESPONSE_ERROR,
+                                   response_status)
+            LOG.info(_LI("Session id expired for: %s"), current.service_uri)
+            # Session expired, relogin and retry....
+            login_retries += 1
+            metrics.METRICS.increment('ncc_request_retries_total',
+                                      method=method, reason='login')
+            self._renew_session(current, session, deadline)
 
         resp_body = resp_dict['body']
-#         LOG.error(_LE("Response status: %(status)s"), {"status": resp_dict['status']})
-#         LOG.error(_LE("Response: %(resp_body)s"), {"resp_body": resp_body})
-        response_status = resp_dict['status']
-        if response_status == httplib.UNAUTHORIZED:
-            if not self.is_login(resource_uri):
-                LOG.exception(_LE("Unable to login.Session id expired"
-                              "for: %s"), self.service_uri)
-                # Session expired, relogin and retry....
-                self.login()
-                # Retry the operation
-                headers.update({AUTH_HEADER: self.auth})
-                response_status, resp_dict = self._execute_request(method,
-                                      resource_uri,
-                                      headers,
-                                      body)
-            else:
-                LOG.exception(_LE("Unable to login. Invalid credentials passed"
-                              "for: %s"), self.service_uri)
-                raise NCCException(NCCException.RESPONSE_ERROR)
         if not self._is_valid_response(response_status):
             response_msg = resp_body
             response_dict = {"method": method,
@@ -293,3 +995,16 @@ class NSClient(object):
             raise NCCException(NCCException.RESPONSE_ERROR, response_status)
         return response_status, resp_dict
 
+
+def _acquire(lock, deadline=None):
+    """Acquire lock, giving up at deadline. Return whether it was acquired.
+
+    Python 2 locks cannot wait with a timeout, so the lock is polled.
+    """
+    if deadline is None:
+        return lock.acquire()
+    while not lock.acquire(False):
+        if time.time() >= deadline:
+            return False
+        time.sleep(LOCK_POLL_INTERVAL)
+    return True
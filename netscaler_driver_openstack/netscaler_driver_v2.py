@@ -15,25 +15,74 @@
 
 
 import abc
+import collections
+import hashlib
 import re
+import threading
+import time
+
+import eventlet
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 
 
+from neutron.callbacks import events
+from neutron.callbacks import registry
+from neutron.callbacks import resources
 from neutron import context as ncontext
 from neutron.i18n import _LE
+from neutron.i18n import _LI
+from neutron.i18n import _LW
 from oslo_service import service
 from neutron.plugins.common import constants
 
+from neutron_lbaas.db.loadbalancer import models
 from neutron_lbaas.drivers import driver_base
 from neutron_lbaas.drivers.driver_mixins import BaseManagerMixin
+from neutron_lbaas.services.loadbalancer import data_models
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import metrics
 from neutron_lbaas.services.loadbalancer.drivers.netscaler import ncc_client
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import (
+    request_queue)
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import sharding
 
 DEFAULT_PERIODIC_TASK_INTERVAL = "2"
 DEFAULT_STATUS_COLLECTION = "True"
 DEFAULT_PAGE_SIZE = "300"
 DEFAULT_IS_SYNCRONOUS = "True"
+DEFAULT_CONNECTION_POOL_SIZE = "10"
+DEFAULT_CONNECTION_IDLE_TIMEOUT = "60"
+DEFAULT_SESSION_TIMEOUT = "1800"
+DEFAULT_MAX_LOGIN_RETRIES = "2"
+DEFAULT_REQUEST_LOG_SAMPLING = "0"
+DEFAULT_MAX_RETRIES = "2"
+DEFAULT_RETRY_BACKOFF = "0.5"
+DEFAULT_RETRY_MAX_BACKOFF = "5"
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = "5"
+DEFAULT_CIRCUIT_RESET_TIMEOUT = "30"
+DEFAULT_LOGIN_TIMEOUTS = "5,30,60"
+DEFAULT_CRUD_TIMEOUTS = "5,60,120"
+DEFAULT_STATUS_TIMEOUTS = "5,10,20"
+DEFAULT_STATUS_COLLECTION_WORKERS = "1"
+DEFAULT_PENDING_SCAN_INTERVAL = "30"
+DEFAULT_STATUS_POLL_INITIAL_INTERVAL = "1"
+DEFAULT_STATUS_POLL_MAX_INTERVAL = "30"
+DEFAULT_STATUS_POLL_BACKOFF_FACTOR = "2"
+DEFAULT_STATUS_TRACKING_TIMEOUT = "3600"
+DEFAULT_ASYNC_REQUESTS = "False"
+DEFAULT_ASYNC_REQUEST_QUEUE_DIR = "/var/lib/neutron/netscaler_requests"
+DEFAULT_ASYNC_REQUEST_WORKERS = "4"
+DEFAULT_ASYNC_REQUEST_MAX_ATTEMPTS = "5"
+DEFAULT_MEMBER_BATCH_SIZE = "100"
+DEFAULT_NETWORK_INFO_CACHE_TTL = "300"
+DEFAULT_NETWORK_INFO_CACHE_SIZE = "1024"
+DEFAULT_MEMBER_STATUS_INTERVAL = "30"
+DEFAULT_STATS_INTERVAL = "30"
+DEFAULT_STATS_CACHE_TTL = "60"
+DEFAULT_RECONCILE_INTERVAL = "0"
+DEFAULT_STATUS_SHARD_HEARTBEAT_TTL = "30"
+DEFAULT_METRICS_FLUSH_INTERVAL = "60"
 
 PROV = "provisioning_status"
 NETSCALER = "netscaler"
@@ -43,7 +92,10 @@ LOG = logging.getLogger(__name__)
 NETSCALER_CC_OPTS = [
     cfg.StrOpt(
         'netscaler_ncc_uri',
-        help=_('The URL to reach the NetScaler Control Center Server.'),
+        help=_('The URL to reach the NetScaler Control Center Server. '
+               'A comma separated list of URLs of the nodes of an NCC HA '
+               'pair or cluster spreads status polling across the nodes '
+               'and fails over to the next node when one is unavailable.'),
     ),
     cfg.StrOpt(
         'netscaler_ncc_username',
@@ -76,6 +128,240 @@ NETSCALER_CC_OPTS = [
         default=DEFAULT_STATUS_COLLECTION + "," + DEFAULT_PAGE_SIZE,
         help=_('Setting for member status collection from'
                'NetScaler Control Center Server.'),
+    ),
+    cfg.StrOpt(
+        'ncc_connection_pool_size',
+        default=DEFAULT_CONNECTION_POOL_SIZE,
+        help=_('Maximum number of idle persistent connections kept open '
+               'to the NetScaler Control Center Server.'),
+    ),
+    cfg.StrOpt(
+        'ncc_connection_idle_timeout',
+        default=DEFAULT_CONNECTION_IDLE_TIMEOUT,
+        help=_('Seconds after which an idle persistent connection to the '
+               'NetScaler Control Center Server is closed.'),
+    ),
+    cfg.StrOpt(
+        'ncc_session_timeout',
+        default=DEFAULT_SESSION_TIMEOUT,
+        help=_('Lifetime in seconds of a NetScaler Control Center Server '
+               'session. Sessions are renewed shortly before it runs out.'),
+    ),
+    cfg.StrOpt(
+        'ncc_max_login_retries',
+        default=DEFAULT_MAX_LOGIN_RETRIES,
+        help=_('Number of times a request rejected with an expired session '
+               'is retried after logging in again.'),
+    ),
+    cfg.StrOpt(
+        'ncc_request_log_sampling',
+        default=DEFAULT_REQUEST_LOG_SAMPLING,
+        help=_('Log one of every N requests sent to the NetScaler Control '
+               'Center Server with its status and duration, when debug '
+               'logging is enabled. 0 disables the request log.'),
+    ),
+    cfg.StrOpt(
+        'ncc_max_retries',
+        default=DEFAULT_MAX_RETRIES,
+        help=_('Number of times a request to the NetScaler Control Center '
+               'Server is retried when it is unavailable. Creates are only '
+               'retried when the connection could not be established.'),
+    ),
+    cfg.StrOpt(
+        'ncc_retry_backoff',
+        default=DEFAULT_RETRY_BACKOFF,
+        help=_('Seconds of the first retry backoff, doubled for every '
+               'further retry. The actual wait is a random fraction of it.'),
+    ),
+    cfg.StrOpt(
+        'ncc_retry_max_backoff',
+        default=DEFAULT_RETRY_MAX_BACKOFF,
+        help=_('Maximum seconds of the retry backoff.'),
+    ),
+    cfg.StrOpt(
+        'ncc_circuit_failure_threshold',
+        default=DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+        help=_('Number of consecutive failed requests after which requests '
+               'to the NetScaler Control Center Server fail immediately '
+               'until it is reachable again. 0 disables it.'),
+    ),
+    cfg.StrOpt(
+        'ncc_circuit_reset_timeout',
+        default=DEFAULT_CIRCUIT_RESET_TIMEOUT,
+        help=_('Seconds between checks whether an unavailable NetScaler '
+               'Control Center Server is reachable again.'),
+    ),
+    cfg.StrOpt(
+        'ncc_login_timeouts',
+        default=DEFAULT_LOGIN_TIMEOUTS,
+        help=_('Connect timeout, read timeout and deadline including '
+               'retries, in seconds, of logins to the NetScaler Control '
+               'Center Server.'),
+    ),
+    cfg.StrOpt(
+        'ncc_crud_timeouts',
+        default=DEFAULT_CRUD_TIMEOUTS,
+        help=_('Connect timeout, read timeout and deadline including '
+               'retries, in seconds, of create, update, delete and other '
+               'requests to the NetScaler Control Center Server, e.g. the '
+               'reads of a refresh.'),
+    ),
+    cfg.StrOpt(
+        'ncc_status_timeouts',
+        default=DEFAULT_STATUS_TIMEOUTS,
+        help=_('Connect timeout, read timeout and deadline including '
+               'retries, in seconds, of status and statistics requests to '
+               'the NetScaler Control Center Server.'),
+    ),
+    cfg.StrOpt(
+        'status_collection_workers',
+        default=DEFAULT_STATUS_COLLECTION_WORKERS,
+        help=_('Number of load balancer trees whose provisioning status '
+               'is tracked in parallel. 1 tracks them one after another.'),
+    ),
+    cfg.StrOpt(
+        'status_collection_deadline',
+        help=_('Seconds a parallel status collection cycle may run before '
+               'the remaining load balancers are left for the next cycle. '
+               'Defaults to the interval of the status collection, the '
+               'smaller of periodic_task_interval and '
+               'status_poll_initial_interval.'),
+    ),
+    cfg.StrOpt(
+        'pending_scan_interval',
+        default=DEFAULT_PENDING_SCAN_INTERVAL,
+        help=_('Seconds between scans of the neutron database for pending '
+               'NetScaler load balancers that this driver is not tracking '
+               'yet. Between scans only tracked load balancers are read.'),
+    ),
+    cfg.StrOpt(
+        'status_poll_initial_interval',
+        default=DEFAULT_STATUS_POLL_INITIAL_INTERVAL,
+        help=_('Seconds before the status of a newly submitted operation '
+               'is polled for the first time.'),
+    ),
+    cfg.StrOpt(
+        'status_poll_max_interval',
+        default=DEFAULT_STATUS_POLL_MAX_INTERVAL,
+        help=_('Upper bound in seconds for the poll interval of a load '
+               'balancer whose operations stay pending.'),
+    ),
+    cfg.StrOpt(
+        'status_poll_backoff_factor',
+        default=DEFAULT_STATUS_POLL_BACKOFF_FACTOR,
+        help=_('Factor the poll interval of a load balancer grows by '
+               'after every poll that finds it still pending.'),
+    ),
+    cfg.StrOpt(
+        'status_tracking_timeout',
+        default=DEFAULT_STATUS_TRACKING_TIMEOUT,
+        help=_('Seconds after which pending operations that the NetScaler '
+               'Control Center Server has not completed are set to ERROR. '
+               '0 tracks them forever.'),
+    ),
+    cfg.StrOpt(
+        'async_requests',
+        default=DEFAULT_ASYNC_REQUESTS,
+        help=_('Queue create, update and delete requests locally and send '
+               'them to the NetScaler Control Center Server from background '
+               'workers, so API calls do not wait for it. Implies '
+               'is_synchronous = False.'),
+    ),
+    cfg.StrOpt(
+        'async_request_queue_dir',
+        default=DEFAULT_ASYNC_REQUEST_QUEUE_DIR,
+        help=_('Directory holding queued requests until the NetScaler '
+               'Control Center Server accepted them.'),
+    ),
+    cfg.StrOpt(
+        'async_request_workers',
+        default=DEFAULT_ASYNC_REQUEST_WORKERS,
+        help=_('Number of background workers sending queued requests.'),
+    ),
+    cfg.StrOpt(
+        'async_request_max_attempts',
+        default=DEFAULT_ASYNC_REQUEST_MAX_ATTEMPTS,
+        help=_('Number of times a queued request is sent before the entity '
+               'it belongs to is set to ERROR.'),
+    ),
+    cfg.StrOpt(
+        'member_batch_size',
+        default=DEFAULT_MEMBER_BATCH_SIZE,
+        help=_('Maximum number of members a refresh creates on the '
+               'NetScaler Control Center Server in one request.'),
+    ),
+    cfg.StrOpt(
+        'network_info_cache_ttl',
+        default=DEFAULT_NETWORK_INFO_CACHE_TTL,
+        help=_('Seconds the network details of a subnet are cached for '
+               'load balancer and member creation. 0 disables the cache.'),
+    ),
+    cfg.StrOpt(
+        'network_info_cache_size',
+        default=DEFAULT_NETWORK_INFO_CACHE_SIZE,
+        help=_('Maximum number of subnets whose network details are '
+               'cached.'),
+    ),
+    cfg.StrOpt(
+        'member_status_interval',
+        default=DEFAULT_MEMBER_STATUS_INTERVAL,
+        help=_('Seconds between collections of member operating status '
+               'from the NetScaler Control Center Server, when '
+               'netscaler_status_collection is enabled.'),
+    ),
+    cfg.StrOpt(
+        'stats_interval',
+        default=DEFAULT_STATS_INTERVAL,
+        help=_('Seconds between collections of load balancer and listener '
+               'statistics from the NetScaler Control Center Server. 0 '
+               'only fetches statistics when they are requested.'),
+    ),
+    cfg.StrOpt(
+        'stats_cache_ttl',
+        default=DEFAULT_STATS_CACHE_TTL,
+        help=_('Seconds collected statistics are served from memory.'),
+    ),
+    cfg.StrOpt(
+        'reconcile_interval',
+        default=DEFAULT_RECONCILE_INTERVAL,
+        help=_('Seconds between refreshes of all active NetScaler load '
+               'balancers, which repair objects missing from or differing '
+               'on the NetScaler Control Center Server. 0 disables it.'),
+    ),
+    cfg.StrOpt(
+        'status_shard_dir',
+        help=_('Directory shared by all neutron-server workers, on every '
+               'host, running this driver. When set, the workers split '
+               'the load balancers between them, and only the owner polls '
+               'the provisioning status of a load balancer and reconciles '
+               'it. Member status is collected by one worker. Unset, every '
+               'worker does all of it.'),
+    ),
+    cfg.StrOpt(
+        'status_shard_heartbeat_ttl',
+        default=DEFAULT_STATUS_SHARD_HEARTBEAT_TTL,
+        help=_('Seconds after the last heartbeat of a worker when its load '
+               'balancers move to the remaining workers.'),
+    ),
+    cfg.StrOpt(
+        'metrics_statsd_address',
+        default="",
+        help=_('host:port of a statsd server the driver metrics are sent '
+               'to. Empty disables it.'),
+    ),
+    cfg.StrOpt(
+        'metrics_textfile',
+        help=_('Path of a file the driver metrics are written to in the '
+               'Prometheus text format, for the node exporter textfile '
+               'collector. Every neutron-server process writes its own '
+               'file, with its pid before the extension, e.g. '
+               'netscaler.1234.prom, and labels its metrics with '
+               'worker=<pid>. Empty disables it.'),
+    ),
+    cfg.StrOpt(
+        'metrics_flush_interval',
+        default=DEFAULT_METRICS_FLUSH_INTERVAL,
+        help=_('Seconds between writes of the metrics textfile.'),
     )
 ]
 
@@ -95,6 +381,8 @@ MEMBER_RESOURCE = 'member'
 MONITORS_RESOURCE = 'healthmonitors'
 MONITOR_RESOURCE = 'healthmonitor'
 STATS_RESOURCE = 'stats'
+GRAPHS_RESOURCE = 'graphs'
+GRAPH_RESOURCE = 'graph'
 PROV_SEGMT_ID = 'provider:segmentation_id'
 PROV_NET_TYPE = 'provider:network_type'
 DRIVER_NAME = 'netscaler_driver'
@@ -110,8 +398,261 @@ GET_METHOD["PENDING_CREATE"] = "POST"
 GET_METHOD["PENDING_UPDATE"] = "PUT"
 GET_METHOD["PENDING_DELETE"] = "DELETE"
 ITEM_NOT_FOUND="ItemNotFound"
-
-PROVISIONING_STATUS_TRACKER = []
+PENDING_STATUSES = [constants.PENDING_CREATE, constants.PENDING_UPDATE,
+                    constants.PENDING_DELETE]
+# Number of entity ids queried per journal context request.
+JOURNAL_CONTEXT_BATCH_SIZE = 50
+# Number of member ids per bulk operating status update.
+MEMBER_STATUS_UPDATE_BATCH_SIZE = 500
+# NCC member states and the neutron operating status they stand for.
+MEMBER_OPERATING_STATUS = {
+    'UP': constants.ONLINE,
+    'DOWN': constants.OFFLINE,
+    'OUT OF SERVICE': constants.DISABLED,
+}
+# Neutron operating statuses NCC may also report as they are.
+MEMBER_OPERATING_STATUS.update(
+    (status, status) for status in (constants.ONLINE, constants.OFFLINE,
+                                    constants.DISABLED,
+                                    constants.NO_MONITOR))
+# Operating status of members in a state missing above.
+DEFAULT_MEMBER_OPERATING_STATUS = constants.OFFLINE
+STATS_KEYS = ('bytes_in', 'bytes_out', 'active_connections',
+              'total_connections')
+STATS_ID_KEY = {LBS_RESOURCE: 'loadbalancer_id',
+                LISTENERS_RESOURCE: 'listener_id'}
+# Order in which a refresh creates missing objects, parents first. Objects
+# only known to NCC are removed in the reverse order.
+REFRESH_ORDER = {LBS_RESOURCE: 0, LISTENERS_RESOURCE: 1, POOLS_RESOURCE: 2,
+                 MEMBERS_RESOURCE: 3, MONITORS_RESOURCE: 3}
+# Hash ring key of the member status collection, run by a single worker.
+MEMBER_STATUS_SHARD_KEY = 'memberstatus'
+
+
+class ProvisioningStatusTracker(object):
+
+    """Load balancers whose provisioning status is tracked by the driver.
+
+    Entries are added by the managers when an operation is left pending
+    and removed once the whole load balancer tree is ACTIVE or ERROR.
+    Every entry is polled first after initial_interval seconds; each poll
+    that finds the tree still pending multiplies its interval by
+    backoff_factor, up to max_interval.
+    """
+
+    def __init__(self, initial_interval=1, max_interval=30,
+                 backoff_factor=2):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.set_backoff(initial_interval, max_interval, backoff_factor)
+
+    def set_backoff(self, initial_interval, max_interval, backoff_factor):
+        self.initial_interval = float(initial_interval)
+        self.max_interval = float(max_interval)
+        self.backoff_factor = float(backoff_factor)
+
+    def add(self, lb_id, graph=False):
+        """Track a new operation on lb_id and poll it again quickly.
+
+        graph marks a load balancer created with its whole tree in one
+        request, whose objects share the journal context of that request.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(lb_id)
+            if entry is None:
+                entry = TrackedLoadBalancer(lb_id)
+                self._entries[lb_id] = entry
+            if graph:
+                entry.graph = True
+            entry.changed_here = True
+            entry.last_changed = now
+            entry.poll_interval = self.initial_interval
+            entry.next_poll = now + self.initial_interval
+
+    def add_found(self, lb_id, now=None):
+        """Track a load balancer found pending in the database.
+
+        It is due at now, the time of the scan that found it, so the
+        cycle of the scan polls it right away.
+        """
+        with self._lock:
+            if lb_id not in self._entries:
+                entry = TrackedLoadBalancer(lb_id)
+                entry.next_poll = now or entry.first_seen
+                self._entries[lb_id] = entry
+
+    def backoff(self, lb_id):
+        with self._lock:
+            entry = self._entries.get(lb_id)
+            if entry is None:
+                return
+            entry.poll_interval = min(
+                max(entry.poll_interval, self.initial_interval) *
+                self.backoff_factor, self.max_interval)
+            entry.next_poll = time.time() + entry.poll_interval
+
+    def is_due(self, lb_id, now=None):
+        entry = self._entries.get(lb_id)
+        return entry is not None and entry.next_poll <= (now or time.time())
+
+    def due_ids(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            return [lb_id for lb_id, entry in self._entries.items()
+                    if entry.next_poll <= now]
+
+    def discard(self, lb_id, read_at=None):
+        """Stop tracking lb_id.
+
+        When read_at is given, the entry is kept if a new operation was
+        tracked after the load balancer tree was read at that time.
+        """
+        with self._lock:
+            entry = self._entries.get(lb_id)
+            if entry is None:
+                return
+            if read_at is not None and entry.last_changed > read_at:
+                return
+            del self._entries[lb_id]
+
+    def get(self, lb_id):
+        return self._entries.get(lb_id)
+
+    def ids(self):
+        with self._lock:
+            return list(self._entries)
+
+    def mark_polled(self, lb_id):
+        entry = self._entries.get(lb_id)
+        if entry:
+            entry.last_polled = time.time()
+
+    def __contains__(self, lb_id):
+        return lb_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TrackedLoadBalancer(object):
+
+    def __init__(self, lb_id):
+        self.lb_id = lb_id
+        self.first_seen = time.time()
+        self.last_changed = self.first_seen
+        self.last_polled = None
+        self.poll_interval = 0
+        self.next_poll = self.first_seen
+        self.graph = False
+        # Changed by this worker, which polls it whether or not it owns
+        # its shard.
+        self.changed_here = False
+
+
+PROVISIONING_STATUS_TRACKER = ProvisioningStatusTracker()
+
+
+class NetworkInfoCache(object):
+
+    """LRU cache of PayloadPreparer.get_network_info results by subnet id.
+
+    Entries expire after ttl seconds and are dropped early when neutron
+    reports that their subnet or network was updated or deleted.
+    """
+
+    def __init__(self, ttl=300, max_size=1024):
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.configure(ttl, max_size)
+
+    def configure(self, ttl, max_size):
+        self.ttl = float(ttl)
+        self.max_size = int(max_size)
+        self.clear()
+
+    def get(self, subnet_id):
+        with self._lock:
+            entry = self._entries.pop(subnet_id, None)
+            if entry is None:
+                return None
+            network_info, expires = entry
+            if expires < time.time():
+                return None
+            # Re-inserting keeps the most recently used entries last.
+            self._entries[subnet_id] = entry
+            return dict(network_info)
+
+    def set(self, subnet_id, network_info):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(subnet_id, None)
+            self._entries[subnet_id] = (dict(network_info),
+                                        time.time() + self.ttl)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_subnet(self, subnet_id):
+        with self._lock:
+            self._entries.pop(subnet_id, None)
+
+    def invalidate_network(self, network_id):
+        with self._lock:
+            for subnet_id, (network_info, __) in list(self._entries.items()):
+                if network_info.get('network_id') == network_id:
+                    del self._entries[subnet_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+NETWORK_INFO_CACHE = NetworkInfoCache()
+
+
+class StatsCache(object):
+
+    """Statistics of load balancers and listeners, kept for ttl seconds."""
+
+    def __init__(self, ttl=60):
+        self.ttl = float(ttl)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, resource, entity_id):
+        entry = self._entries.get((resource, entity_id))
+        if entry is None or entry[1] < time.time():
+            return None
+        return dict(entry[0])
+
+    def set(self, resource, entity_id, stats):
+        with self._lock:
+            self._entries[(resource, entity_id)] = (stats,
+                                                    time.time() + self.ttl)
+
+    def expire(self):
+        now = time.time()
+        with self._lock:
+            for key, (__, expires) in list(self._entries.items()):
+                if expires < now:
+                    del self._entries[key]
+
+
+def _invalidate_network_info(resource, event, trigger, **kwargs):
+    if resource == resources.SUBNET:
+        subnet = kwargs.get('subnet') or {}
+        subnet_id = kwargs.get('subnet_id') or subnet.get('id')
+        if subnet_id:
+            NETWORK_INFO_CACHE.invalidate_subnet(subnet_id)
+            return
+    else:
+        network = kwargs.get('network') or {}
+        network_id = kwargs.get('network_id') or network.get('id')
+        if network_id:
+            NETWORK_INFO_CACHE.invalidate_network(network_id)
+            return
+    NETWORK_INFO_CACHE.clear()
 
 
 class NetScalerLoadBalancerDriverV2(driver_base.LoadBalancerBaseDriver):
@@ -121,19 +662,112 @@ class NetScalerLoadBalancerDriverV2(driver_base.LoadBalancerBaseDriver):
 
         self.driver_conf = cfg.CONF.netscaler_driver
         self.admin_ctx = ncontext.get_admin_context()
+        self._init_metrics()
         self._init_client()
+        self._init_network_info_cache()
+        self._init_request_queue()
         self._init_managers()
         self._init_status_collection()
 
+    def _init_metrics(self):
+        emitters = []
+        statsd_address = self.driver_conf.metrics_statsd_address
+        if statsd_address:
+            host, port = statsd_address.rsplit(':', 1)
+            emitters.append(metrics.StatsdEmitter(host, port))
+        if self.driver_conf.metrics_textfile:
+            emitters.append(metrics.PrometheusTextfileEmitter(
+                self.driver_conf.metrics_textfile))
+        metrics.METRICS.set_emitters(emitters)
+        self.metrics_flush_interval = float(
+            self.driver_conf.metrics_flush_interval)
+
     def _init_client(self):
         self.ncc_uri = self.driver_conf.netscaler_ncc_uri
         self.ncc_username = self.driver_conf.netscaler_ncc_username
         self.ncc_password = self.driver_conf.netscaler_ncc_password
         self.ncc_cleanup_mode = cfg.CONF.netscaler_driver.netscaler_ncc_cleanup_mode
-        self.client = ncc_client.NSClient(self.ncc_uri,
-                                          self.ncc_username,
-                                          self.ncc_password,
-                                          self.ncc_cleanup_mode)
+        self.ncc_pool_size = int(self.driver_conf.ncc_connection_pool_size)
+        self.ncc_idle_timeout = int(
+            self.driver_conf.ncc_connection_idle_timeout)
+        self.client = ncc_client.get_client(
+            self.ncc_uri,
+            self.ncc_username,
+            self.ncc_password,
+            self.ncc_cleanup_mode,
+            connection_pool_size=self.ncc_pool_size,
+            connection_idle_timeout=self.ncc_idle_timeout,
+            session_timeout=int(self.driver_conf.ncc_session_timeout),
+            max_login_retries=int(self.driver_conf.ncc_max_login_retries),
+            request_log_sampling=int(
+                self.driver_conf.ncc_request_log_sampling),
+            max_retries=int(self.driver_conf.ncc_max_retries),
+            retry_backoff=float(self.driver_conf.ncc_retry_backoff),
+            retry_max_backoff=float(self.driver_conf.ncc_retry_max_backoff),
+            circuit_failure_threshold=int(
+                self.driver_conf.ncc_circuit_failure_threshold),
+            circuit_reset_timeout=float(
+                self.driver_conf.ncc_circuit_reset_timeout),
+            timeouts=self._get_ncc_timeouts())
+
+    def _get_ncc_timeouts(self):
+        timeouts = {}
+        for operation, conf in (
+                (ncc_client.LOGIN_OPERATION,
+                 self.driver_conf.ncc_login_timeouts),
+                (ncc_client.CRUD_OPERATION,
+                 self.driver_conf.ncc_crud_timeouts),
+                (ncc_client.STATUS_OPERATION,
+                 self.driver_conf.ncc_status_timeouts)):
+            connect, read, deadline = conf.split(",")
+            timeouts[operation] = ncc_client.NCCTimeouts(
+                float(connect), float(read), float(deadline))
+        return timeouts
+
+    def _init_network_info_cache(self):
+        NETWORK_INFO_CACHE.configure(
+            self.driver_conf.network_info_cache_ttl,
+            self.driver_conf.network_info_cache_size)
+        # Not every neutron release sends all of these events, the ttl
+        # bounds the staleness of the cache for the ones that are missing.
+        network_resource = getattr(resources, 'NETWORK', 'network')
+        for resource in (resources.SUBNET, network_resource):
+            for event in (events.AFTER_UPDATE, events.AFTER_DELETE):
+                registry.subscribe(_invalidate_network_info, resource, event)
+
+    def _init_request_queue(self):
+        self.request_queue = None
+        if self.driver_conf.async_requests.lower() != "true":
+            return
+        self.request_queue = request_queue.NCCRequestQueue(
+            self.client,
+            self.driver_conf.async_request_queue_dir,
+            int(self.driver_conf.async_request_workers),
+            int(self.driver_conf.async_request_max_attempts),
+            sent_callback=self._queued_request_sent,
+            failed_callback=self._queued_request_failed)
+        self.request_queue.start()
+
+    def _queued_request_sent(self, request):
+        # Poll the journal context of the request soon, it exists now.
+        PROVISIONING_STATUS_TRACKER.add(request['lb_id'])
+
+    def _queued_request_failed(self, request):
+        context = ncontext.get_admin_context()
+        entity_manager = self._get_manager(request['entity_type'])
+        try:
+            db_entity = entity_manager.get_db_entity(context,
+                                                     request['entity_id'])
+            entity_manager.failed_completion(context, db_entity)
+        except Exception:
+            LOG.exception(_LE("error with failed completion"))
+
+    def _get_manager(self, entity_type):
+        return {LBS_RESOURCE: self.load_balancer,
+                LISTENERS_RESOURCE: self.listener,
+                POOLS_RESOURCE: self.pool,
+                MEMBERS_RESOURCE: self.member,
+                MONITORS_RESOURCE: self.health_monitor}[entity_type]
 
     def _init_managers(self):
         self.load_balancer = NetScalerLoadBalancerManager(self)
@@ -152,80 +786,289 @@ class NetScalerLoadBalancerDriverV2(driver_base.LoadBalancerBaseDriver):
         if is_status_collection.lower() == "false":
             self.is_status_collection = False
         self.pagesize_status_collection = pagesize_status_collection
+        self.status_collection_workers = int(
+            self.driver_conf.status_collection_workers)
+        self.status_poll_initial_interval = float(
+            self.driver_conf.status_poll_initial_interval)
+        # Tick often enough to honour the initial poll interval of new
+        # operations, the tracker decides which load balancers are due.
+        self.status_collection_interval = min(
+            float(self.periodic_task_interval),
+            self.status_poll_initial_interval)
+        self.status_collection_deadline = float(
+            self.driver_conf.status_collection_deadline or
+            self.status_collection_interval)
+        self.pending_scan_interval = float(
+            self.driver_conf.pending_scan_interval)
+        self._last_pending_scan = None
+        self._lbs_in_progress = set()
+        self.member_status_interval = float(
+            self.driver_conf.member_status_interval)
+        self.stats_interval = float(self.driver_conf.stats_interval)
+        self.stats_cache = StatsCache(self.driver_conf.stats_cache_ttl)
+        self.reconcile_interval = float(self.driver_conf.reconcile_interval)
+        self.status_tracking_timeout = float(
+            self.driver_conf.status_tracking_timeout)
+        PROVISIONING_STATUS_TRACKER.set_backoff(
+            self.status_poll_initial_interval,
+            self.driver_conf.status_poll_max_interval,
+            self.driver_conf.status_poll_backoff_factor)
+        membership = None
+        if self.driver_conf.status_shard_dir:
+            membership = sharding.FileMembership(
+                self.driver_conf.status_shard_dir,
+                self.driver_conf.status_shard_heartbeat_ttl)
+        self.shards = sharding.ShardAssignment(membership)
         NetScalerStatusService(self).start()
 
     def collect_provision_status(self):
+        with metrics.METRICS.timer('provision_status_cycle_duration_seconds'):
+            self._collect_provision_status()
+
+    def _collect_provision_status(self):
         LOG.debug("collecting provision status")
         admin_ctx = ncontext.get_admin_context()
-        db_lbs = self.plugin.db.get_loadbalancers(
-                                                  admin_ctx)
-        LOG.debug("all loadbalancers from db are %s" % repr(db_lbs))
+        read_at = time.time()
+        db_lbs = self._get_pending_loadbalancers(admin_ctx)
+        LOG.debug("%d pending loadbalancers from db", len(db_lbs))
+        pending_lbs = []
         for db_lb in db_lbs:
             if db_lb.provider is not None and db_lb.provisioning_status is not None :
                 if ((db_lb.provider.provider_name == NETSCALER) and
                         (db_lb.provisioning_status.startswith("PENDING_"))):
-                    self._update_status_tree_in_db(db_lb)
+                    pending_lbs.append(db_lb)
             else :
                 try:
-                    LOG.info("loadbalancer provider is %s and provisioning_status is %s" % (repr(db_lb.provider),repr(db_lb.provisioning_status)))
-                    LOG.info("loadbalancer with id %s does not have provider or provisioning status" % repr(db_lb.id))
-                    LOG.info("loadbalancer with name %s does not have provider or provisioning status" % repr(db_lb.name))
+                    LOG.info(_LI("loadbalancer %(id)r with name %(name)r "
+                                 "does not have provider or provisioning "
+                                 "status, provider is %(provider)r and "
+                                 "provisioning_status is %(status)r"),
+                             {"id": db_lb.id, "name": db_lb.name,
+                              "provider": db_lb.provider,
+                              "status": db_lb.provisioning_status})
                 except Exception :
                     LOG.exception(
                           _LE("loadbalancer stored in neutron database is not complete"))
-                     
-                
-    def _update_status_tree_in_db(self, db_lb):
-            LOG.debug("status tree to be updated is %s" % repr(db_lb.id))
-            for db_listener in db_lb.listeners:
-                db_listener.loadbalancer = db_lb
-                track= self._track_entity(db_listener, "listeners", self.listener)
-                LOG.debug("tracked listener %s" % repr(self.listener))
-                if not track:
-                    return
-                db_pool = db_listener.default_pool
-                if db_pool:
-                    db_pool.listener = db_listener
-                    track = self._track_entity(db_pool, "pools", self.pool)
-                    LOG.debug("tracked pool %s" % repr(self.pool))
-                    if not track:
-                        return
-                    db_members = db_pool.members
-                    LOG.debug("members are %s" % repr(db_members))
-                    for db_member in db_members:
-                        db_member.pool = db_pool
-                        LOG.debug("member id is %s" % repr(db_member.id))
-                        track = self._track_entity(db_member, "members", self.member)
-                        LOG.debug("tracked member %s" % repr(self.member))
-                        if not track:
-                            return
-                    db_hm = db_pool.healthmonitor
-                    LOG.debug("healthmonitors is %s" % repr(db_hm))
-                    if db_hm:
-                        db_hm.pool = db_pool
-                        LOG.debug("healthmonitors inside if is %s" % repr(db_hm))
-                        track = self._track_entity(db_hm, "healthmonitors", self.health_monitor)
-                        LOG.debug("tracked healthmonitor %s" % repr(self.health_monitor))
-                        if not track:
-                            return
-            self._track_entity(db_lb, "loadbalancers", self.load_balancer)
-            LOG.debug("tracked loadbalancer %s" % repr(self.load_balancer))
-                        
-    def _track_entity(self, db_entity, entity_type, entity_manager):
+        metrics.METRICS.set_gauge('provision_status_pending_loadbalancers',
+                                  len(pending_lbs))
+        metrics.METRICS.set_gauge('provision_status_tracked_loadbalancers',
+                                  len(PROVISIONING_STATUS_TRACKER))
+        self._track_loadbalancers(pending_lbs, read_at)
+
+    def _get_pending_loadbalancers(self, context):
+        """Read the pending load balancers that need to be tracked.
+
+        Usually only the load balancers in PROVISIONING_STATUS_TRACKER are
+        read. Every pending_scan_interval seconds all pending load
+        balancers are read instead, to pick up the ones this process did
+        not change itself, e.g. after a restart. Only load balancers whose
+        next poll is due and that this worker either owns or changed
+        itself are returned, so an operation completes as quickly on any
+        worker; the owner of a load balancer changed by another worker
+        also finds it with its next full scan.
+        """
+        filters = {PROV: PENDING_STATUSES}
+        now = time.time()
+        full_scan = (self._last_pending_scan is None or
+                     now - self._last_pending_scan >=
+                     self.pending_scan_interval)
+        tracked_ids = []
+        for lb_id in PROVISIONING_STATUS_TRACKER.due_ids(now):
+            entry = PROVISIONING_STATUS_TRACKER.get(lb_id)
+            if ((entry is not None and entry.changed_here) or
+                    self.shards.owns(lb_id)):
+                tracked_ids.append(lb_id)
+            else:
+                PROVISIONING_STATUS_TRACKER.discard(lb_id)
+        if full_scan:
+            self._last_pending_scan = now
+        elif not tracked_ids:
+            return []
+        else:
+            filters['id'] = tracked_ids
+        db_lbs = self._get_netscaler_loadbalancers(context, filters)
+        pending_ids = set(db_lb.id for db_lb in db_lbs)
+        for lb_id in tracked_ids:
+            if lb_id not in pending_ids:
+                # Deleted or no longer pending, nothing left to track.
+                PROVISIONING_STATUS_TRACKER.discard(lb_id, now)
+        if full_scan:
+            db_lbs = [db_lb for db_lb in db_lbs
+                      if db_lb.id in tracked_ids or
+                      self.shards.owns(db_lb.id)]
+            for db_lb in db_lbs:
+                PROVISIONING_STATUS_TRACKER.add_found(db_lb.id, now)
+            db_lbs = [db_lb for db_lb in db_lbs
+                      if db_lb.id not in PROVISIONING_STATUS_TRACKER or
+                      PROVISIONING_STATUS_TRACKER.is_due(db_lb.id, now)]
+        return db_lbs
+
+    def _get_netscaler_loadbalancers(self, context, filters):
+        """Read the NetScaler load balancers matching filters.
+
+        Like plugin.db.get_loadbalancers, but the database also filters
+        on the provider, other providers' load balancers are never read.
+        """
+        query = context.session.query(models.LoadBalancer).filter(
+            models.LoadBalancer.provider.has(provider_name=NETSCALER))
+        for attr, values in filters.items():
+            query = query.filter(
+                getattr(models.LoadBalancer, attr).in_(values))
+        return [data_models.LoadBalancer.from_sqlalchemy_model(db_lb)
+                for db_lb in query]
+
+    def _track_loadbalancers(self, db_lbs, read_at=None):
+        if self.status_collection_workers <= 1:
+            for db_lb in db_lbs:
+                self._update_status_tree_in_db(db_lb, read_at=read_at)
+            return
+        # Trees are independent, so one slow load balancer must not hold
+        # up the others. Trees still running when the deadline passes keep
+        # going in the background and are skipped by the next cycle.
+        deadline = time.time() + self.status_collection_deadline
+        pool = eventlet.GreenPool(self.status_collection_workers)
+        for db_lb in db_lbs:
+            if time.time() >= deadline:
+                LOG.debug("status collection deadline reached, remaining "
+                          "loadbalancers are left for the next cycle")
+                break
+            if db_lb.id in self._lbs_in_progress:
+                continue
+            self._lbs_in_progress.add(db_lb.id)
+            pool.spawn_n(self._update_status_tree_in_background, db_lb,
+                         read_at)
+        with eventlet.Timeout(max(deadline - time.time(), 0), False):
+            pool.waitall()
+
+    def _update_status_tree_in_background(self, db_lb, read_at=None):
+        try:
+            # Every green thread needs its own DB session.
+            self._update_status_tree_in_db(db_lb,
+                                           ncontext.get_admin_context(),
+                                           read_at)
+        except Exception:
+            LOG.exception(_LE("error tracking status of loadbalancer %s"),
+                          db_lb.id)
+        finally:
+            self._lbs_in_progress.discard(db_lb.id)
+
+    def _update_status_tree_in_db(self, db_lb, context=None, read_at=None):
+        """Return True once the whole tree is no longer pending."""
+        if self.request_queue and self.request_queue.is_pending(db_lb.id):
+            # NCC has not seen the request yet, so there is no journal
+            # context to poll. Sending it resets the poll schedule.
+            PROVISIONING_STATUS_TRACKER.backoff(db_lb.id)
+            return False
+        PROVISIONING_STATUS_TRACKER.mark_polled(db_lb.id)
+        entry = PROVISIONING_STATUS_TRACKER.get(db_lb.id)
+        if (entry and self.status_tracking_timeout > 0 and
+                time.time() - entry.last_changed >
+                self.status_tracking_timeout):
+            self._expire_status_tree(db_lb, context or self.admin_ctx)
+            resolved = True
+        else:
+            resolved = self._resolve_status_tree(db_lb, context)
+        if resolved:
+            PROVISIONING_STATUS_TRACKER.discard(db_lb.id, read_at)
+        else:
+            PROVISIONING_STATUS_TRACKER.backoff(db_lb.id)
+        return resolved
+
+    def _expire_status_tree(self, db_lb, context):
+        LOG.error(_LE("NetScaler Control Center did not complete the "
+                      "operations on loadbalancer %(lb_id)s within "
+                      "%(timeout)s seconds, setting them to ERROR"),
+                  {"lb_id": db_lb.id,
+                   "timeout": self.status_tracking_timeout})
+        for __, db_entity, entity_manager in self._get_status_tree(db_lb):
+            if db_entity.provisioning_status in PENDING_STATUSES:
+                try:
+                    entity_manager.failed_completion(context, db_entity)
+                except Exception:
+                    LOG.error(_LE("error with failed completion"))
+
+    def _resolve_status_tree(self, db_lb, context=None):
+            LOG.debug("status tree to be updated is %s", db_lb.id)
+            tree = self._get_status_tree(db_lb)
+            statuses = None
+            if self.ncc_cleanup_mode.lower() != "true":
+                entry = PROVISIONING_STATUS_TRACKER.get(db_lb.id)
+                graph_key = None
+                if entry and entry.graph:
+                    graph_key = (GRAPHS_RESOURCE, db_lb.id, "POST")
+                statuses = self._get_task_statuses(tree, graph_key)
+                if statuses is None:
+                    return False
+                if graph_key in statuses:
+                    self._inherit_graph_status(tree, statuses,
+                                               statuses[graph_key])
+            unknown = False
+            for entity_type, db_entity, entity_manager in tree:
+                track = self._track_entity(db_entity, entity_type,
+                                           entity_manager, statuses,
+                                           context)
+                LOG.debug("tracked %s %s", entity_type, db_entity.id)
+                if track is None:
+                    # Still pending without a status on NCC. The tree stays
+                    # tracked, so status_tracking_timeout can end it.
+                    unknown = True
+                elif not track:
+                    return False
+            return not unknown
+
+    def _inherit_graph_status(self, tree, statuses, graph_status):
+        """Apply the status of a graph create to the objects it created."""
+        for entity_type, db_entity, __ in tree:
+            if db_entity.provisioning_status == constants.PENDING_CREATE:
+                statuses.setdefault((entity_type, db_entity.id, "POST"),
+                                    graph_status)
+
+    def _get_status_tree(self, db_lb):
+        """List the entities of a LB tree in the order they are tracked."""
+        tree = []
+        for db_listener in db_lb.listeners:
+            db_listener.loadbalancer = db_lb
+            tree.append((LISTENERS_RESOURCE, db_listener, self.listener))
+            db_pool = db_listener.default_pool
+            if db_pool:
+                db_pool.listener = db_listener
+                tree.append((POOLS_RESOURCE, db_pool, self.pool))
+                for db_member in db_pool.members:
+                    db_member.pool = db_pool
+                    tree.append((MEMBERS_RESOURCE, db_member, self.member))
+                db_hm = db_pool.healthmonitor
+                if db_hm:
+                    db_hm.pool = db_pool
+                    tree.append((MONITORS_RESOURCE, db_hm,
+                                 self.health_monitor))
+        tree.append((LBS_RESOURCE, db_lb, self.load_balancer))
+        return tree
+
+    def _track_entity(self, db_entity, entity_type, entity_manager,
+                      statuses=None, context=None):
+        context = context or self.admin_ctx
         if db_entity.provisioning_status == constants.ACTIVE or db_entity.provisioning_status == constants.ERROR :
             return True
         delete_entity = False
         if self.ncc_cleanup_mode.lower() == "true" :
             if db_entity.provisioning_status == constants.PENDING_DELETE :
                 delete_entity = True
-                self.do_successful_completion_after_tracking(db_entity, entity_manager, delete_entity) 
+                self.do_successful_completion_after_tracking(db_entity, entity_manager, delete_entity, context) 
                 return True 
             else :
                 return True
-        status, message, error_reason = self._get_task_status(entity_type, db_entity)
+        if statuses is None:
+            status, message, error_reason = self._get_task_status(
+                entity_type, db_entity)
+        else:
+            key = (entity_type, db_entity.id,
+                   GET_METHOD[db_entity.provisioning_status])
+            status, message, error_reason = statuses.get(key,
+                                                         (None, None, None))
         if status:
             if status == "Finished" :
-                LOG.debug("status  of entity %s is Finished" % repr(db_entity))
+                LOG.debug("status of %s %s is Finished", entity_type,
+                          db_entity.id)
                 
                 ''' if entity is in PENDING_DELETE and status is Finished,implies successfull deletion from controlcenter,
                 we need to delete it from openstack neutron db as well..
@@ -233,45 +1076,51 @@ class NetScalerLoadBalancerDriverV2(driver_base.LoadBalancerBaseDriver):
                 
                 if db_entity.provisioning_status == constants.PENDING_DELETE:
                     delete_entity = True
-                self.do_successful_completion_after_tracking(db_entity, entity_manager, delete_entity)
+                self.do_successful_completion_after_tracking(db_entity, entity_manager, delete_entity, context)
                 return True
             elif re.match("Error*",status):
-                LOG.debug("status  of entity %s is Error.\n Message returned by controlcenter is %s" % (repr(db_entity),message))
+                LOG.debug("status of %s %s is Error. Message returned by "
+                          "controlcenter is %s", entity_type, db_entity.id,
+                          message)
                 if error_reason == ITEM_NOT_FOUND and db_entity.provisioning_status == constants.PENDING_DELETE:
                     delete_entity = True
-                    self.do_successful_completion_after_tracking(db_entity, entity_manager, delete_entity)
+                    self.do_successful_completion_after_tracking(db_entity, entity_manager, delete_entity, context)
                 else :
                     try:
                         entity_manager.failed_completion(
-                                                     self.admin_ctx, db_entity)
+                                                     context, db_entity)
                     except Exception:
                         LOG.error(_LE("error with failed completion"))
                 return True
             else:
                 return False  
         else :
-            LOG.info("status  of entity %s is not received." % (repr(db_entity)))
-            LOG.info("Entity might be deleted from the control center \
-                            and its status in neutron db is %s." % repr(db_entity.provisioning_status))       
-            return True
+            LOG.info(_LI("status of %(type)s %(id)s is not received. Entity "
+                         "might be deleted from the control center and its "
+                         "status in neutron db is %(status)s."),
+                     {"type": entity_type, "id": db_entity.id,
+                      "status": db_entity.provisioning_status})
+            return None
         
-    def do_successful_completion_after_tracking(self, db_entity,entity_manager,delete_entity):
+    def do_successful_completion_after_tracking(self, db_entity,entity_manager,delete_entity,context=None):
         try:
             entity_manager.successful_completion(
-                    self.admin_ctx, db_entity, delete=delete_entity)
+                    context or self.admin_ctx, db_entity, delete=delete_entity)
         except Exception:
             LOG.error(_LE("error with successful completion"))
  
     def _get_task_status(self,entity_type, entity): 
         ''' example resource path sent to NCC will be ncc_ip/admin/v1/journalcontexts?filter=operation:POST,entity_type:vips,entity_id:54a3-4bee-ae08-70f840c83ae0 '''      
         resource_path = "%s/%s?filter=operation:%s,entity_type:%s,entity_id:%s" % (ADMIN_PREFIX,JOURNAL_CONTEXTS,GET_METHOD[entity.provisioning_status],entity_type,entity.id)
-        LOG.debug("resource path is %s" % repr(resource_path))
+        LOG.debug("resource path is %s", resource_path)
         status = None
         message = None
         result = None
         error_reason = None
         try:
-            __,result = (self.client.retrieve_resource("GLOBAL",resource_path))
+            __,result = (self.client.retrieve_resource(
+                "GLOBAL", resource_path,
+                operation=ncc_client.STATUS_OPERATION))
              
         except Exception:
             LOG.error("Request to get journal context from NMAS failed")
@@ -281,29 +1130,284 @@ class NetScalerLoadBalancerDriverV2(driver_base.LoadBalancerBaseDriver):
             LOG.debug("result of GET journal context api is None")
             return status,message,error_reason
         
-        if "body" in result :
-            result = jsonutils.loads(result['body'])
-            
-        LOG.debug("result of GET journalcontexts is %s" % repr(result))
+        result = result['dict']
+        LOG.debug("result of GET journalcontexts is %r", result)
         if "journalcontexts" in result and len(result["journalcontexts"]) > 0 :
             status = result['journalcontexts'][0]['status']
             message = result['journalcontexts'][0]['message']
             error_reason =  result['journalcontexts'][0]['error_reason']
-        LOG.debug("status and error reason returned from controlcenter is %s and %s" % (status,error_reason))
+        LOG.debug("status and error reason returned from controlcenter is "
+                  "%s and %s", status, error_reason)
         return status,message,error_reason
                     
+    def _get_task_statuses(self, tree, extra_key=None):
+        """Fetch the journal contexts of every pending entity of a tree.
+
+        The entity ids are sent in chunks of JOURNAL_CONTEXT_BATCH_SIZE
+        and every chunk is read page by page, so a LB with hundreds of
+        members needs a handful of requests instead of one per entity.
+        Returns a dict keyed by (entity_type, entity_id, operation) with
+        the (status, message, error_reason) of the newest journal context,
+        or None when NCC could not be queried. extra_key names one more
+        journal context to look for.
+        """
+        wanted = set()
+        if extra_key:
+            wanted.add(extra_key)
+        for entity_type, db_entity, __ in tree:
+            if db_entity.provisioning_status in GET_METHOD:
+                wanted.add((entity_type, db_entity.id,
+                            GET_METHOD[db_entity.provisioning_status]))
+        metrics.METRICS.increment('provision_status_pending_entities_total',
+                                  len(wanted))
+        statuses = {}
+        page_size = int(self.pagesize_status_collection)
+        entity_ids = sorted(set(entity_id for __, entity_id, __ in wanted))
+        for start in range(0, len(entity_ids), JOURNAL_CONTEXT_BATCH_SIZE):
+            chunk = entity_ids[start:start + JOURNAL_CONTEXT_BATCH_SIZE]
+            page = 1
+            while True:
+                resource_path = "%s/%s?filter=entity_id:%s&%s=%d&%s=%d" % (
+                    ADMIN_PREFIX, JOURNAL_CONTEXTS, "|".join(chunk),
+                    PAGE, page, SIZE, page_size)
+                try:
+                    __, result = self.client.retrieve_resource(
+                        "GLOBAL", resource_path,
+                        operation=ncc_client.STATUS_OPERATION)
+                except Exception:
+                    LOG.error(_LE("Request to get journal contexts from "
+                                  "NMAS failed"))
+                    return None
+                contexts = result.iter_items(JOURNAL_CONTEXTS) if result else []
+                context_count = 0
+                for context in contexts:
+                    context_count += 1
+                    key = (context.get('entity_type'),
+                           context.get('entity_id'),
+                           context.get('operation'))
+                    # NCC lists the newest journal context first.
+                    if key in wanted and key not in statuses:
+                        statuses[key] = (context.get('status'),
+                                         context.get('message'),
+                                         context.get('error_reason'))
+                if (context_count < page_size or
+                        len(statuses) == len(wanted)):
+                    break
+                page += 1
+        LOG.debug("journal contexts received for %d of %d pending entities",
+                  len(statuses), len(wanted))
+        return statuses
+
+
+    def collect_member_status(self):
+        """Sync member operating status from NCC into neutron.
+
+        oca/v2/memberstatus is read page by page. The operating status
+        in neutron of the members of a page is read with one query, and
+        only members whose status differs are written, in bulk. Neutron
+        is compared rather than the previous collection, because other
+        writers, e.g. the completion of an update, change the status
+        too. With status_shard_dir set only one worker collects it.
+        """
+        if not self.shards.owns(MEMBER_STATUS_SHARD_KEY):
+            return
+        LOG.debug("collecting member status")
+        admin_ctx = ncontext.get_admin_context()
+        page_size = int(self.pagesize_status_collection)
+        seen = set()
+        unknown_states = set()
+        changed_count = 0
+        page = 1
+        while True:
+            resource_path = "%s/%s?%s=%d&%s=%d" % (STATUS_PREFIX,
+                                                   MEMBER_STATUS, PAGE, page,
+                                                   SIZE, page_size)
+            try:
+                __, result = self.client.retrieve_resource(
+                    "GLOBAL", resource_path,
+                    operation=ncc_client.STATUS_OPERATION)
+            except Exception:
+                LOG.error(_LE("Request to get member status from NMAS "
+                              "failed"))
+                return
+            member_statuses = (result.iter_items(MEMBER_STATUS) if result
+                               else [])
+            member_count = 0
+            statuses = {}
+            for member_status in member_statuses:
+                member_count += 1
+                member_id = (member_status.get('member_id') or
+                             member_status.get('id'))
+                status = (member_status.get('operating_status') or
+                          member_status.get('status'))
+                if not member_id or not status:
+                    continue
+                state = status.upper()
+                status = MEMBER_OPERATING_STATUS.get(state)
+                if status is None:
+                    unknown_states.add(state)
+                    status = DEFAULT_MEMBER_OPERATING_STATUS
+                seen.add(member_id)
+                statuses[member_id] = status
+            if statuses:
+                try:
+                    changed = self._get_changed_member_statuses(admin_ctx,
+                                                                statuses)
+                    if changed:
+                        self._update_member_status_in_db(admin_ctx, changed)
+                except Exception:
+                    LOG.exception(_LE("error updating member status"))
+                    return
+                for member_ids in changed.values():
+                    changed_count += len(member_ids)
+            if member_count < page_size:
+                break
+            page += 1
+        if unknown_states:
+            LOG.warning(_LW("Unknown NCC member states %(states)s, set as "
+                            "%(status)s"),
+                        {"states": ", ".join(sorted(unknown_states)),
+                         "status": DEFAULT_MEMBER_OPERATING_STATUS})
+        LOG.debug("operating status changed for %d of %d members",
+                  changed_count, len(seen))
+
+    def _get_changed_member_statuses(self, context, statuses):
+        """Group the members whose status in neutron differs by status.
+
+        statuses maps member ids to the status reported by NCC. Members
+        neutron does not know are left out.
+        """
+        member_ids = list(statuses)
+        changed = {}
+        for start in range(0, len(member_ids),
+                           MEMBER_STATUS_UPDATE_BATCH_SIZE):
+            chunk = member_ids[start:start + MEMBER_STATUS_UPDATE_BATCH_SIZE]
+            query = context.session.query(models.MemberV2.id,
+                                          models.MemberV2.operating_status)
+            for member_id, operating_status in query.filter(
+                    models.MemberV2.id.in_(chunk)):
+                if operating_status != statuses[member_id]:
+                    changed.setdefault(statuses[member_id], []).append(
+                        member_id)
+        return changed
+
+    def _update_member_status_in_db(self, context, changed):
+        with context.session.begin(subtransactions=True):
+            for status, member_ids in changed.items():
+                for start in range(0, len(member_ids),
+                                   MEMBER_STATUS_UPDATE_BATCH_SIZE):
+                    chunk = member_ids[
+                        start:start + MEMBER_STATUS_UPDATE_BATCH_SIZE]
+                    query = context.session.query(models.MemberV2)
+                    query.filter(models.MemberV2.id.in_(chunk)).update(
+                        {'operating_status': status},
+                        synchronize_session=False)
+
+
+    def collect_stats(self):
+        """Refresh the statistics of all load balancers and listeners.
+
+        Each resource type is read page by page from its stats collection
+        in NCC, instead of one request per load balancer or listener.
+        """
+        LOG.debug("collecting statistics")
+        page_size = int(self.pagesize_status_collection)
+        for resource in (LBS_RESOURCE, LISTENERS_RESOURCE):
+            page = 1
+            while True:
+                resource_path = "%s/%s/%s?%s=%d&%s=%d" % (
+                    RESOURCE_PREFIX, resource, STATS_RESOURCE, PAGE, page,
+                    SIZE, page_size)
+                try:
+                    __, result = self.client.retrieve_resource(
+                        "GLOBAL", resource_path,
+                        operation=ncc_client.STATUS_OPERATION)
+                except Exception:
+                    LOG.error(_LE("Request to get %s statistics from NMAS "
+                                  "failed"), resource)
+                    break
+                entity_stats = (result.iter_items(STATS_RESOURCE) if result
+                                else [])
+                stats_count = 0
+                for stats in entity_stats:
+                    stats_count += 1
+                    entity_id = (stats.get(STATS_ID_KEY[resource]) or
+                                 stats.get('id'))
+                    if entity_id:
+                        self.stats_cache.set(resource, entity_id,
+                                             self._get_stats_values(stats))
+                if stats_count < page_size:
+                    break
+                page += 1
+        self.stats_cache.expire()
+
+    def get_stats(self, context, resource, entity_id):
+        stats = self.stats_cache.get(resource, entity_id)
+        if stats is not None:
+            return stats
+        resource_path = "%s/%s/%s/%s" % (RESOURCE_PREFIX, resource,
+                                         entity_id, STATS_RESOURCE)
+        try:
+            __, result = self.client.retrieve_resource(
+                context.tenant_id, resource_path,
+                operation=ncc_client.STATUS_OPERATION)
+        except Exception:
+            LOG.error(_LE("Request to get statistics of %(resource)s "
+                          "%(entity_id)s from NMAS failed"),
+                      {"resource": resource, "entity_id": entity_id})
+            return self._get_stats_values({})
+        stats = {}
+        if result and result['dict']:
+            stats = result['dict'].get(STATS_RESOURCE) or {}
+        stats = self._get_stats_values(stats)
+        self.stats_cache.set(resource, entity_id, stats)
+        return stats
+
+    def _get_stats_values(self, stats):
+        return dict((key, int(stats.get(key) or 0)) for key in STATS_KEYS)
+
+
+    def reconcile_loadbalancers(self):
+        """Refresh every active NetScaler load balancer.
+
+        Every tree is read again right before its refresh, objects added
+        through the API since the listing would otherwise look like
+        orphans on NCC and be removed.
+        """
+        LOG.debug("reconciling loadbalancers")
+        admin_ctx = ncontext.get_admin_context()
+        lb_ids = [db_lb.id for db_lb in self._get_netscaler_loadbalancers(
+            admin_ctx, {PROV: [constants.ACTIVE]})]
+        for lb_id in lb_ids:
+            if not self.shards.owns(lb_id):
+                continue
+            # A new session, which does not return the objects cached by
+            # the listing.
+            lb_ctx = ncontext.get_admin_context()
+            try:
+                db_lbs = self._get_netscaler_loadbalancers(
+                    lb_ctx, {'id': [lb_id], PROV: [constants.ACTIVE]})
+                if not db_lbs:
+                    # Deleted or changed since the listing.
+                    continue
+                self.load_balancer.refresh(lb_ctx, db_lbs[0])
+            except Exception:
+                LOG.exception(_LE("error refreshing loadbalancer %s"),
+                              lb_id)
+
+
 class NetScalerCommonManager(BaseManagerMixin):
 
     def __init__(self, driver):
         super(NetScalerCommonManager, self).__init__(driver)
         self.payload_preparer = PayloadPreparer()
-        self.client = ncc_client.NSClient(driver.ncc_uri,
-                                          driver.ncc_username,
-                                          driver.ncc_password,
-                                          driver.ncc_cleanup_mode)
+        # All managers and the status service share the driver's client,
+        # and with it one NCC session and one connection pool.
+        self.client = driver.client
+        self.request_queue = driver.request_queue
 
         self.is_synchronous = self.driver.driver_conf.is_synchronous
-        if self.is_synchronous.lower() == "false":
+        if self.is_synchronous.lower() == "false" or self.request_queue:
             self.is_synchronous = False
         else:
             self.is_synchronous = True
@@ -323,10 +1427,12 @@ class NetScalerCommonManager(BaseManagerMixin):
             raise
 
     def update(self, context, old_obj, obj):
-        LOG.debug("%s, update %s", self.__class__.__name__, old_obj.id)
+        LOG.debug("%s, update %s", self.__class__.__name__, obj.id)
         try:
-            self.update_entity(context, old_obj, obj)
-            if self.is_synchronous:
+            # update_entity returns False when nothing NCC knows about
+            # changed and no request was sent, there is nothing to track.
+            sent = self.update_entity(context, old_obj, obj)
+            if self.is_synchronous or sent is False:
                 self.successful_completion(context, obj)
             else:
                 self.track_provision_status(obj)
@@ -348,14 +1454,67 @@ class NetScalerCommonManager(BaseManagerMixin):
 
     def track_provision_status(self, obj):
         for lb in self._get_loadbalancers(obj):
-            if lb.id not in PROVISIONING_STATUS_TRACKER:
-                PROVISIONING_STATUS_TRACKER.append(lb.id)
+            PROVISIONING_STATUS_TRACKER.add(lb.id)
 
     def _get_loadbalancers(self, obj):
         lbs = []
         lbs.append(obj.root_loadbalancer)
         return lbs
 
+    def _create_resource(self, context, obj, resource_path, object_name,
+                         object_data):
+        self._send_request('POST', context, obj, resource_path, object_name,
+                           object_data)
+
+    def _update_resource(self, context, obj, resource_path, object_name,
+                         object_data):
+        self._send_request('PUT', context, obj, resource_path, object_name,
+                           object_data)
+
+    def _remove_resource(self, context, obj, resource_path):
+        self._send_request('DELETE', context, obj, resource_path)
+
+    def _send_request(self, method, context, obj, resource_path,
+                      object_name=None, object_data=None):
+        if self.request_queue:
+            self.request_queue.put(obj.root_loadbalancer.id,
+                                   self.entity_type, obj.id, method,
+                                   context.tenant_id, resource_path,
+                                   object_name, object_data)
+        elif method == 'POST':
+            self.client.create_resource(context.tenant_id, resource_path,
+                                        object_name, object_data)
+        elif method == 'PUT':
+            self.client.update_resource(context.tenant_id, resource_path,
+                                        object_name, object_data)
+        else:
+            self.client.remove_resource(context.tenant_id, resource_path)
+
+    @abc.abstractmethod
+    def get_update_payload(self, obj):
+        pass
+
+    def _get_changed_payload(self, old_obj, obj):
+        """Return the update payload attributes that differ from old_obj.
+
+        Without old_obj the full update payload is returned.
+        """
+        payload = self.get_update_payload(obj)
+        if old_obj is None:
+            return payload
+        old_payload = self.get_update_payload(old_obj)
+        changes = dict((attr, value) for attr, value in payload.items()
+                       if attr not in old_payload or
+                       old_payload[attr] != value)
+        if not changes:
+            LOG.debug("%s %s unchanged, not sending an update",
+                      self.entity_type, obj.id)
+        return changes
+
+    def get_db_entity(self, context, entity_id):
+        return getattr(self.driver.plugin.db, self.db_getter)(context,
+                                                              entity_id)
+
     @abc.abstractmethod
     def create_entity(self, context, obj):
         pass
@@ -372,140 +1531,343 @@ class NetScalerCommonManager(BaseManagerMixin):
 class NetScalerLoadBalancerManager(NetScalerCommonManager,
                                    driver_base.BaseLoadBalancerManager):
 
+    entity_type = LBS_RESOURCE
+    db_getter = 'get_loadbalancer'
+
     def __init__(self, driver):
         driver_base.BaseLoadBalancerManager.__init__(self, driver)
         NetScalerCommonManager.__init__(self, driver)
 
     def refresh(self, context, lb_obj):
-        # This is intended to trigger the backend to check and repair
-        # the state of this load balancer and all of its dependent objects
+        """Check and repair the NCC copy of a load balancer tree.
+
+        The tree is read from NCC with one request per object type (plus
+        one per pool for its members) and compared object by object with
+        neutron. Missing objects are created, missing members in bulk per
+        pool, objects whose attributes differ are updated and objects only
+        known to NCC are removed, provided their parent ids show that they
+        belong to this load balancer.
+        """
         LOG.debug("LB refresh %s", lb_obj.id)
+        if context.tenant_id is None:
+            # E.g. the admin context of reconcile_loadbalancers, send the
+            # requests for the GLOBAL tenant like the status collection.
+            context = context.elevated()
+            context.tenant_id = "GLOBAL"
+        ncc_tree, ncc_parents = self._get_ncc_tree(context, lb_obj.id)
+        tree = self.driver._get_status_tree(lb_obj)
+        tree.sort(key=lambda entity: REFRESH_ORDER[entity[0]])
+        expected = set()
+        missing_members = {}
+        created = updated = removed = 0
+        for entity_type, entity, entity_manager in tree:
+            if entity.provisioning_status == constants.PENDING_DELETE:
+                continue
+            key = (entity_type, entity.id)
+            expected.add(key)
+            ncc_obj = ncc_tree.get(key)
+            if ncc_obj is None:
+                if entity_type == LBS_RESOURCE:
+                    # Not as a graph, the children missing on NCC are
+                    # created one by one below.
+                    self._create_loadbalancer(context, entity)
+                elif (entity_type == MEMBERS_RESOURCE and
+                      not self.request_queue):
+                    # Created in bulk per pool below. A bulk request
+                    # would bypass the queue and could overtake the
+                    # queued creation of its pool.
+                    missing_members.setdefault(entity.pool.id, []).append(
+                        entity)
+                else:
+                    entity_manager.create_entity(context, entity)
+                created += 1
+                continue
+            payload = entity_manager.get_update_payload(entity)
+            ncc_payload = dict((attr, ncc_obj.get(attr)) for attr in payload)
+            if self._digest(payload) != self._digest(ncc_payload):
+                entity_manager.update_entity(context, None, entity)
+                updated += 1
+        for pool_id, members in missing_members.items():
+            self.driver.member._send_members(context, 'POST', pool_id,
+                                             members)
+        orphans = []
+        for ncc_key in ncc_tree:
+            if ncc_key in expected:
+                continue
+            if not self._is_in_tree(ncc_tree, ncc_parents, ncc_key,
+                                    lb_obj.id):
+                LOG.debug("LB refresh %s: not removing %s %s, it does not "
+                          "belong to the load balancer", lb_obj.id,
+                          ncc_key[0], ncc_key[1])
+                continue
+            orphans.append(ncc_key)
+        orphans.sort(key=lambda key: REFRESH_ORDER[key[0]], reverse=True)
+        for entity_type, entity_id in orphans:
+            if entity_type == MEMBERS_RESOURCE:
+                resource_path = "%s/%s/%s/%s/%s" % (
+                    RESOURCE_PREFIX, POOLS_RESOURCE,
+                    ncc_parents[(entity_type, entity_id)], MEMBERS_RESOURCE,
+                    entity_id)
+            else:
+                resource_path = "%s/%s/%s" % (RESOURCE_PREFIX, entity_type,
+                                              entity_id)
+            self.client.remove_resource(context.tenant_id, resource_path)
+            removed += 1
+        LOG.debug("LB refresh %s: created %d, updated %d, removed %d",
+                  lb_obj.id, created, updated, removed)
+
+    def _is_in_tree(self, ncc_tree, ncc_parents, key, lb_id):
+        """Whether the NCC object of key belongs to the tree of lb_id.
+
+        The listings of _get_ncc_tree are only filtered by NCC, so an
+        object belongs to the tree only if its parent ids lead to lb_id.
+        """
+        entity_type, entity_id = key
+        ncc_obj = ncc_tree.get(key) or {}
+        if entity_type == LBS_RESOURCE:
+            return entity_id == lb_id
+        if entity_type == LISTENERS_RESOURCE:
+            return ncc_obj.get('loadbalancer_id') == lb_id
+        if entity_type == POOLS_RESOURCE:
+            if ncc_obj.get('loadbalancer_id') == lb_id:
+                return True
+            parent_key = (LISTENERS_RESOURCE, ncc_obj.get('listener_id'))
+        elif entity_type == MONITORS_RESOURCE:
+            parent_key = (POOLS_RESOURCE, ncc_obj.get('pool_id'))
+        else:
+            parent_key = (POOLS_RESOURCE, ncc_parents.get(key))
+        return (parent_key in ncc_tree and
+                self._is_in_tree(ncc_tree, ncc_parents, parent_key, lb_id))
+
+    def _get_ncc_tree(self, context, lb_id):
+        """Read a load balancer tree from NCC.
+
+        Returns a dict of the NCC objects keyed by (entity_type, id) and a
+        dict mapping the keys of members to the id of their pool.
+        """
+        ncc_tree = {}
+        ncc_parents = {}
+        ncc_lb = self._retrieve(context, "%s/%s/%s" % (
+            RESOURCE_PREFIX, LBS_RESOURCE, lb_id), LB_RESOURCE)
+        if not ncc_lb:
+            return ncc_tree, ncc_parents
+        ncc_tree[(LBS_RESOURCE, lb_id)] = ncc_lb
+        for entity_type in (LISTENERS_RESOURCE, POOLS_RESOURCE,
+                            MONITORS_RESOURCE):
+            ncc_objs = self._retrieve(context, "%s/%s?loadbalancer_id=%s" % (
+                RESOURCE_PREFIX, entity_type, lb_id), entity_type)
+            for ncc_obj in ncc_objs or []:
+                ncc_tree[(entity_type, ncc_obj['id'])] = ncc_obj
+        pool_ids = [entity_id for entity_type, entity_id in list(ncc_tree)
+                    if entity_type == POOLS_RESOURCE]
+        for pool_id in pool_ids:
+            ncc_members = self._retrieve(context, "%s/%s/%s/%s" % (
+                RESOURCE_PREFIX, POOLS_RESOURCE, pool_id, MEMBERS_RESOURCE),
+                MEMBERS_RESOURCE)
+            for ncc_member in ncc_members or []:
+                key = (MEMBERS_RESOURCE, ncc_member['id'])
+                ncc_tree[key] = ncc_member
+                ncc_parents[key] = pool_id
+        return ncc_tree, ncc_parents
+
+    def _retrieve(self, context, resource_path, object_name):
+        try:
+            __, result = self.client.retrieve_resource(context.tenant_id,
+                                                       resource_path)
+        except ncc_client.NCCException as e:
+            if e.is_not_found_exception():
+                return None
+            raise
+        if result and result['dict']:
+            return result['dict'].get(object_name)
+
+    def _digest(self, payload):
+        return hashlib.sha1(jsonutils.dumps(payload, sort_keys=True)
+                            ).hexdigest()
 
     def stats(self, context, lb_obj):
-        pass
+        LOG.debug(
+            "Tenant id %s , LB stats %s", context.tenant_id, lb_obj.id)
+        return self.driver.get_stats(context, LBS_RESOURCE, lb_obj.id)
+
+    def get_update_payload(self, obj):
+        return self.payload_preparer.prepare_lb_for_update(obj)
+
+    @property
+    def allows_create_graph(self):
+        return True
 
     def create_entity(self, context, lb_obj):
+        if lb_obj.listeners:
+            self._create_graph(context, lb_obj)
+        else:
+            self._create_loadbalancer(context, lb_obj)
+
+    def _create_loadbalancer(self, context, lb_obj):
+        """Create the load balancer alone, without its listeners."""
         ncc_lb = self.payload_preparer.prepare_lb_for_creation(lb_obj)
         vip_subnet_id = lb_obj.vip_subnet_id
         network_info = self.payload_preparer.\
             get_network_info(context, self.driver.plugin, vip_subnet_id)
         ncc_lb = dict(ncc_lb.items() + network_info.items())
-        msg = _("NetScaler driver lb creation: %s") % repr(ncc_lb)
-        LOG.debug(msg)
+        LOG.debug("NetScaler driver lb creation: %r", ncc_lb)
         resource_path = "%s/%s" % (RESOURCE_PREFIX, LBS_RESOURCE)
-        self.client.create_resource(context.tenant_id, resource_path,
-                                    LB_RESOURCE, ncc_lb)
+        self._create_resource(context, lb_obj, resource_path,
+                              LB_RESOURCE, ncc_lb)
+
+    def _create_graph(self, context, lb_obj):
+        """Create a load balancer and its whole tree with one request.
+
+        NCC records a single journal context for the request, which the
+        status tracker applies to every object of the tree.
+        """
+        ncc_graph = self.payload_preparer.prepare_graph_for_creation(
+            context, self.driver.plugin, lb_obj)
+        LOG.debug("NetScaler driver graph creation of lb %s with %d "
+                  "listeners", lb_obj.id, len(lb_obj.listeners))
+        resource_path = "%s/%s" % (RESOURCE_PREFIX, GRAPHS_RESOURCE)
+        self._create_resource(context, lb_obj, resource_path,
+                              GRAPH_RESOURCE, ncc_graph)
+        if self.is_synchronous:
+            # create() completes the load balancer itself afterwards.
+            for __, entity, entity_manager in self.driver._get_status_tree(
+                    lb_obj)[:-1]:
+                entity_manager.successful_completion(context, entity)
+        else:
+            PROVISIONING_STATUS_TRACKER.add(lb_obj.id, graph=True)
 
     def update_entity(self, context, old_lb_obj, lb_obj):
-        update_lb = self.payload_preparer.prepare_lb_for_update(lb_obj)
+        update_lb = self._get_changed_payload(old_lb_obj, lb_obj)
+        if not update_lb:
+            return False
         resource_path = "%s/%s/%s" % (RESOURCE_PREFIX, LBS_RESOURCE, lb_obj.id)
-        msg = (_("NetScaler driver lb_obj %(lb_obj_id)s update: %(lb_obj)s") %
-               {"lb_obj_id": old_lb_obj.id, "lb_obj": repr(lb_obj)})
-        LOG.debug(msg)
-        self.client.update_resource(context.tenant_id, resource_path,
-                                    LB_RESOURCE, update_lb)
+        LOG.debug("NetScaler driver lb_obj %(lb_obj_id)s update: %(lb_obj)r",
+                  {"lb_obj_id": lb_obj.id, "lb_obj": lb_obj})
+        self._update_resource(context, lb_obj, resource_path,
+                              LB_RESOURCE, update_lb)
 
     def delete_entity(self, context, lb_obj):
         """Delete a loadbalancer on a NetScaler device."""
         resource_path = "%s/%s/%s" % (RESOURCE_PREFIX, LBS_RESOURCE, lb_obj.id)
-        msg = _("NetScaler driver lb_obj removal: %s") % lb_obj.id
-        LOG.debug(msg)
-        self.client.remove_resource(context.tenant_id, resource_path)
+        LOG.debug("NetScaler driver lb_obj removal: %s", lb_obj.id)
+        self._remove_resource(context, lb_obj, resource_path)
 
 
 class NetScalerListenerManager(NetScalerCommonManager,
                                driver_base.BaseListenerManager):
 
+    entity_type = LISTENERS_RESOURCE
+    db_getter = 'get_listener'
+
     def __init__(self, driver):
         driver_base.BaseListenerManager.__init__(self, driver)
         NetScalerCommonManager.__init__(self, driver)
 
     def stats(self, context, listener):
-        # returning dummy status now
         LOG.debug(
             "Tenant id %s , Listener stats %s", context.tenant_id, listener.id)
-        return {
-            "bytes_in": 0,
-            "bytes_out": 0,
-            "active_connections": 0,
-            "total_connections": 0
-        }
+        return self.driver.get_stats(context, LISTENERS_RESOURCE,
+                                     listener.id)
+
+    def get_update_payload(self, obj):
+        return self.payload_preparer.prepare_listener_for_update(obj)
 
     def create_entity(self, context, listener):
         """Listener is created with loadbalancer """
         ncc_listener = self.payload_preparer.prepare_listener_for_creation(
             listener)
-        msg = _("NetScaler driver listener creation: %s") % repr(ncc_listener)
-        LOG.debug(msg)
+        LOG.debug("NetScaler driver listener creation: %r", ncc_listener)
         resource_path = "%s/%s" % (RESOURCE_PREFIX, LISTENERS_RESOURCE)
-        self.client.create_resource(context.tenant_id, resource_path,
-                                    LISTENER_RESOURCE, ncc_listener)
+        self._create_resource(context, listener, resource_path,
+                              LISTENER_RESOURCE, ncc_listener)
 
     def update_entity(self, context, old_listener, listener):
-        update_listener = self.payload_preparer.prepare_listener_for_update(
-            listener)
+        update_listener = self._get_changed_payload(old_listener, listener)
+        if not update_listener:
+            return False
         resource_path = "%s/%s/%s" % (RESOURCE_PREFIX, LISTENERS_RESOURCE,
                                       listener.id)
-        msg = (_("NetScaler driver listener %(listener_id)s "
-                 "update: %(listener_obj)s") %
-               {"listener_id": old_listener.id,
-                "listener_obj": repr(listener)})
-        LOG.debug(msg)
-        self.client.update_resource(context.tenant_id, resource_path,
-                                    LISTENER_RESOURCE, update_listener)
+        LOG.debug("NetScaler driver listener %(listener_id)s "
+                  "update: %(listener_obj)r",
+                  {"listener_id": listener.id,
+                   "listener_obj": listener})
+        self._update_resource(context, listener, resource_path,
+                              LISTENER_RESOURCE, update_listener)
 
     def delete_entity(self, context, listener):
         """Delete a listener on a NetScaler device."""
         resource_path = "%s/%s/%s" % (RESOURCE_PREFIX, LISTENERS_RESOURCE,
                                       listener.id)
-        msg = _("NetScaler driver listener removal: %s") % listener.id
-        LOG.debug(msg)
-        self.client.remove_resource(context.tenant_id, resource_path)
+        LOG.debug("NetScaler driver listener removal: %s", listener.id)
+        self._remove_resource(context, listener, resource_path)
 
 
 class NetScalerPoolManager(NetScalerCommonManager,
                            driver_base.BasePoolManager):
 
+    entity_type = POOLS_RESOURCE
+    db_getter = 'get_pool'
+
     def __init__(self, driver):
         driver_base.BasePoolManager.__init__(self, driver)
         NetScalerCommonManager.__init__(self, driver)
 
+    def get_update_payload(self, obj):
+        return self.payload_preparer.prepare_pool_for_update(obj)
+
     def create_entity(self, context, pool):
         ncc_pool = self.payload_preparer.prepare_pool_for_creation(
             pool)
-        msg = _("NetScaler driver pool creation: %s") % repr(ncc_pool)
-        LOG.debug(msg)
+        LOG.debug("NetScaler driver pool creation: %r", ncc_pool)
         resource_path = "%s/%s" % (RESOURCE_PREFIX, POOLS_RESOURCE)
-        self.client.create_resource(context.tenant_id, resource_path,
-                                    POOL_RESOURCE, ncc_pool)
+        self._create_resource(context, pool, resource_path,
+                              POOL_RESOURCE, ncc_pool)
 
     def update_entity(self, context, old_pool, pool):
-        update_pool = self.payload_preparer.prepare_pool_for_update(pool)
+        update_pool = self._get_changed_payload(old_pool, pool)
+        if not update_pool:
+            return False
         resource_path = "%s/%s/%s" % (RESOURCE_PREFIX, POOLS_RESOURCE,
                                       pool.id)
-        msg = (_("NetScaler driver pool %(pool_id)s update: %(pool_obj)s") %
-               {"pool_id": old_pool.id, "pool_obj": repr(pool)})
-        LOG.debug(msg)
-        self.client.update_resource(context.tenant_id, resource_path,
-                                    POOL_RESOURCE, update_pool)
+        LOG.debug("NetScaler driver pool %(pool_id)s update: %(pool_obj)r",
+                  {"pool_id": pool.id, "pool_obj": pool})
+        self._update_resource(context, pool, resource_path,
+                              POOL_RESOURCE, update_pool)
 
     def delete_entity(self, context, pool):
         """Delete a pool on a NetScaler device."""
         resource_path = "%s/%s/%s" % (RESOURCE_PREFIX, POOLS_RESOURCE,
                                       pool.id)
-        msg = _("NetScaler driver pool removal: %s") % pool.id
-        LOG.debug(msg)
-        self.client.remove_resource(context.tenant_id, resource_path)
+        LOG.debug("NetScaler driver pool removal: %s", pool.id)
+        self._remove_resource(context, pool, resource_path)
 
 
 class NetScalerMemberManager(NetScalerCommonManager,
                              driver_base.BaseMemberManager):
 
+    entity_type = MEMBERS_RESOURCE
+    db_getter = 'get_pool_member'
+
     def __init__(self, driver):
         driver_base.BaseMemberManager.__init__(self, driver)
         NetScalerCommonManager.__init__(self, driver)
+        self.batch_size = int(driver.driver_conf.member_batch_size)
+
+    def get_update_payload(self, obj):
+        return self.payload_preparer.prepare_member_for_update(obj)
 
     def create_entity(self, context, member):
+        self._create_member(context, member)
+
+    def update_entity(self, context, old_member, member):
+        if old_member and not self._get_changed_payload(old_member, member):
+            return False
+        self._update_member(context, old_member, member)
+
+    def delete_entity(self, context, member):
+        self._delete_member(context, member)
+
+    def _create_member(self, context, member):
 
         ncc_member = self.payload_preparer.prepare_member_for_creation(member)
         subnet_id = member.subnet_id
@@ -513,30 +1875,28 @@ class NetScalerMemberManager(NetScalerCommonManager,
                         get_network_info(context, self.driver.plugin,
                                          subnet_id))
         ncc_member = dict(ncc_member.items() + network_info.items())
-        msg = _("NetScaler driver member creation: %s") % repr(ncc_member)
-        LOG.debug(msg)
+        LOG.debug("NetScaler driver member creation: %r", ncc_member)
         parent_pool_id = member.pool.id
         resource_path = "%s/%s/%s/%s" % (RESOURCE_PREFIX, POOLS_RESOURCE,
                                          parent_pool_id, MEMBERS_RESOURCE)
-        self.client.create_resource(context.tenant_id, resource_path,
-                                    MEMBER_RESOURCE, ncc_member)
+        self._create_resource(context, member, resource_path,
+                              MEMBER_RESOURCE, ncc_member)
 
-    def update_entity(self, context, old_member, member):
+    def _update_member(self, context, old_member, member):
         parent_pool_id = member.pool.id
-        update_member = self.payload_preparer.prepare_member_for_update(member)
+        update_member = self._get_changed_payload(old_member, member)
         resource_path = "%s/%s/%s/%s/%s" % (RESOURCE_PREFIX,
                                             POOLS_RESOURCE,
                                             parent_pool_id,
                                             MEMBERS_RESOURCE,
                                             member.id)
-        msg = (_("NetScaler driver member %(member_id)s "
-                 "update: %(member_obj)s") %
-               {"member_id": old_member.id, "member_obj": repr(member)})
-        LOG.debug(msg)
-        self.client.update_resource(context.tenant_id, resource_path,
-                                    MEMBER_RESOURCE, update_member)
+        LOG.debug("NetScaler driver member %(member_id)s "
+                  "update: %(member_obj)r",
+                  {"member_id": member.id, "member_obj": member})
+        self._update_resource(context, member, resource_path,
+                              MEMBER_RESOURCE, update_member)
 
-    def delete_entity(self, context, member):
+    def _delete_member(self, context, member):
         """Delete a member on a NetScaler device."""
         parent_pool_id = member.pool.id
         resource_path = "%s/%s/%s/%s/%s" % (RESOURCE_PREFIX,
@@ -544,45 +1904,128 @@ class NetScalerMemberManager(NetScalerCommonManager,
                                             parent_pool_id,
                                             MEMBERS_RESOURCE,
                                             member.id)
-        msg = _("NetScaler driver member removal: %s") % member.id
-        LOG.debug(msg)
-        self.client.remove_resource(context.tenant_id, resource_path)
+        LOG.debug("NetScaler driver member removal: %s", member.id)
+        self._remove_resource(context, member, resource_path)
+
+    def _send_members(self, context, method, pool_id, members):
+        """Send one operation on many members of a pool.
+
+        For internal paths like refresh that hold all the members at
+        once. They go out in requests of at most member_batch_size
+        members on the members collection of the pool, a single member
+        as a regular member request. Returns one result per member.
+        """
+        results = []
+        for start in range(0, len(members), self.batch_size):
+            results.extend(self._send_member_chunk(
+                context, method, pool_id,
+                members[start:start + self.batch_size]))
+        return results
+
+    def _send_member_chunk(self, context, method, pool_id, members):
+        tenant_id = context.tenant_id
+        if len(members) == 1:
+            if method == 'POST':
+                self._create_member(context, members[0])
+            elif method == 'PUT':
+                self._update_member(context, None, members[0])
+            else:
+                self._delete_member(context, members[0])
+            return [None]
+        resource_path = "%s/%s/%s/%s" % (RESOURCE_PREFIX, POOLS_RESOURCE,
+                                         pool_id, MEMBERS_RESOURCE)
+        LOG.debug("NetScaler driver bulk %s of %d members of pool %s",
+                  method, len(members), pool_id)
+        if method == 'POST':
+            ncc_members = self.payload_preparer.prepare_members_for_pool(
+                members)
+            networks_info = self.payload_preparer.get_network_info_bulk(
+                context, self.driver.plugin,
+                set(member.subnet_id for member in members))
+            for ncc_member in ncc_members:
+                ncc_member.update(networks_info[ncc_member['subnet_id']])
+            result = self.client.create_resource(tenant_id, resource_path,
+                                                 MEMBERS_RESOURCE,
+                                                 ncc_members)
+        elif method == 'PUT':
+            ncc_members = []
+            for member in members:
+                ncc_member = self.payload_preparer.prepare_member_for_update(
+                    member)
+                ncc_member['id'] = member.id
+                ncc_members.append(ncc_member)
+            result = self.client.update_resource(tenant_id, resource_path,
+                                                 MEMBERS_RESOURCE,
+                                                 ncc_members)
+        else:
+            ncc_members = [{'id': member.id} for member in members]
+            result = self.client.remove_resource(tenant_id, resource_path,
+                                                 object_name=MEMBERS_RESOURCE,
+                                                 object_data=ncc_members)
+        return self._get_member_results(members, result)
+
+    def _get_member_results(self, members, result):
+        """Map the per member errors of a bulk response to the members."""
+        errors = {}
+        if isinstance(result, tuple) and result[1]:
+            resp_dict = result[1].get('dict') or {}
+            for ncc_member in resp_dict.get(MEMBERS_RESOURCE) or []:
+                if isinstance(ncc_member, dict) and ncc_member.get('error'):
+                    errors[ncc_member.get('id')] = ncc_member
+        results = []
+        for member in members:
+            error = errors.get(member.id)
+            if error:
+                LOG.error(_LE("NetScaler Control Center rejected member "
+                              "%(member_id)s: %(error)s"),
+                          {"member_id": member.id, "error": error['error']})
+                results.append(ncc_client.NCCException(
+                    ncc_client.NCCException.RESPONSE_ERROR,
+                    error.get('status', 400)))
+            else:
+                results.append(None)
+        return results
 
 
 class NetScalerHealthMonitorManager(NetScalerCommonManager,
                                     driver_base.BaseHealthMonitorManager):
 
+    entity_type = MONITORS_RESOURCE
+    db_getter = 'get_healthmonitor'
+
     def __init__(self, driver):
         driver_base.BaseHealthMonitorManager.__init__(self, driver)
         NetScalerCommonManager.__init__(self, driver)
 
+    def get_update_payload(self, obj):
+        return self.payload_preparer.prepare_healthmonitor_for_update(obj)
+
     def create_entity(self, context, hm):
         ncc_hm = self.payload_preparer.prepare_healthmonitor_for_creation(hm)
-        msg = _("NetScaler driver healthmonitor creation: %s") % repr(ncc_hm)
-        LOG.debug(msg)
+        LOG.debug("NetScaler driver healthmonitor creation: %r", ncc_hm)
         resource_path = "%s/%s" % (RESOURCE_PREFIX, MONITORS_RESOURCE)
-        self.client.create_resource(context.tenant_id, resource_path,
-                                    MONITOR_RESOURCE, ncc_hm)
+        self._create_resource(context, hm, resource_path,
+                              MONITOR_RESOURCE, ncc_hm)
 
     def update_entity(self, context, old_healthmonitor, hm):
-        update_hm = self.payload_preparer.prepare_healthmonitor_for_update(hm)
+        update_hm = self._get_changed_payload(old_healthmonitor, hm)
+        if not update_hm:
+            return False
         resource_path = "%s/%s/%s" % (RESOURCE_PREFIX, MONITORS_RESOURCE,
                                       hm.id)
-        msg = (_("NetScaler driver healthmonitor %(healthmonitor_id)s "
-                 "update: %(healthmonitor_obj)s") %
-               {"healthmonitor_id": old_healthmonitor.id,
-                "healthmonitor_obj": repr(hm)})
-        LOG.debug(msg)
-        self.client.update_resource(context.tenant_id, resource_path,
-                                    MONITOR_RESOURCE, update_hm)
+        LOG.debug("NetScaler driver healthmonitor %(healthmonitor_id)s "
+                  "update: %(healthmonitor_obj)r",
+                  {"healthmonitor_id": hm.id,
+                   "healthmonitor_obj": hm})
+        self._update_resource(context, hm, resource_path,
+                              MONITOR_RESOURCE, update_hm)
 
     def delete_entity(self, context, hm):
         """Delete a healthmonitor on a NetScaler device."""
         resource_path = "%s/%s/%s" % (RESOURCE_PREFIX, MONITORS_RESOURCE,
                                       hm.id)
-        msg = _("NetScaler driver healthmonitor removal: %s") % hm.id
-        LOG.debug(msg)
-        self.client.remove_resource(context.tenant_id, resource_path)
+        LOG.debug("NetScaler driver healthmonitor removal: %s", hm.id)
+        self._remove_resource(context, hm, resource_path)
 
 
 class PayloadPreparer(object):
@@ -709,13 +2152,92 @@ class PayloadPreparer(object):
             ncc_hm['expected_codes'] = health_monitor.expected_codes
         return ncc_hm
 
+    def prepare_graph_for_creation(self, context, plugin, lb):
+        """Nest the creation payloads of a whole load balancer tree."""
+        members = []
+        for listener in lb.listeners:
+            if listener.default_pool:
+                members.extend(listener.default_pool.members)
+        subnet_ids = set(member.subnet_id for member in members)
+        subnet_ids.add(lb.vip_subnet_id)
+        networks_info = self.get_network_info_bulk(context, plugin,
+                                                   subnet_ids)
+        ncc_lb = self.prepare_lb_for_creation(lb)
+        ncc_lb.update(networks_info[lb.vip_subnet_id])
+        ncc_lb['listeners'] = []
+        for listener in lb.listeners:
+            listener.loadbalancer = lb
+            ncc_listener = self.prepare_listener_for_creation(listener)
+            pool = listener.default_pool
+            if pool:
+                pool.listener = listener
+                ncc_pool = self.prepare_pool_for_creation(pool)
+                ncc_pool['members'] = self.prepare_members_for_pool(
+                    pool.members)
+                for ncc_member in ncc_pool['members']:
+                    ncc_member.update(networks_info[ncc_member['subnet_id']])
+                if pool.healthmonitor:
+                    pool.healthmonitor.pool = pool
+                    ncc_pool['healthmonitor'] = (
+                        self.prepare_healthmonitor_for_creation(
+                            pool.healthmonitor))
+                ncc_listener['default_pool'] = ncc_pool
+            ncc_lb['listeners'].append(ncc_listener)
+        return {LB_RESOURCE: ncc_lb}
+
     def get_network_info(self, context, plugin, subnet_id):
-        network_info = {}
+        network_info = NETWORK_INFO_CACHE.get(subnet_id)
+        if network_info is not None:
+            return network_info
         subnet = plugin.db._core_plugin.get_subnet(context, subnet_id)
         network_id = subnet['network_id']
         network = plugin.db._core_plugin.get_network(context, network_id)
-        network_info['network_id'] = network_id
-        network_info['subnet_id'] = subnet_id
+        network_info = self._build_network_info(subnet, network)
+        NETWORK_INFO_CACHE.set(subnet_id, network_info)
+        return network_info
+
+    def get_network_info_bulk(self, context, plugin, subnet_ids):
+        """Return get_network_info results for many subnets by subnet id.
+
+        Subnets missing from the cache are read with one subnet and one
+        network query in total. Subnets or networks the bulk queries do
+        not return are read one by one with get_network_info, which raises
+        the usual not found error of the core plugin.
+        """
+        networks_info = {}
+        missing = set()
+        for subnet_id in subnet_ids:
+            network_info = NETWORK_INFO_CACHE.get(subnet_id)
+            if network_info is None:
+                missing.add(subnet_id)
+            else:
+                networks_info[subnet_id] = network_info
+        if missing:
+            core_plugin = plugin.db._core_plugin
+            subnets = core_plugin.get_subnets(
+                context, filters={'id': list(missing)})
+            network_ids = list(set(subnet['network_id']
+                                   for subnet in subnets))
+            networks = dict((network['id'], network) for network in
+                            core_plugin.get_networks(
+                                context, filters={'id': network_ids}))
+            for subnet in subnets:
+                network = networks.get(subnet['network_id'])
+                if network is None:
+                    continue
+                network_info = self._build_network_info(subnet, network)
+                NETWORK_INFO_CACHE.set(subnet['id'], network_info)
+                networks_info[subnet['id']] = network_info
+            for subnet_id in missing:
+                if subnet_id not in networks_info:
+                    networks_info[subnet_id] = self.get_network_info(
+                        context, plugin, subnet_id)
+        return networks_info
+
+    def _build_network_info(self, subnet, network):
+        network_info = {}
+        network_info['network_id'] = subnet['network_id']
+        network_info['subnet_id'] = subnet['id']
         network_info['subnet_name'] = subnet['name']
         if PROV_NET_TYPE in network:
             network_info['network_type'] = network[PROV_NET_TYPE]
@@ -740,11 +2262,47 @@ class NetScalerStatusService(service.Service):
         super(NetScalerStatusService, self).start()
         try :
             self.tg.add_timer(
-                int(self.driver.periodic_task_interval),
+                self.driver.status_collection_interval,
                 self.driver.collect_provision_status,
                 None
                 
             )
+            if self.driver.is_status_collection:
+                self.tg.add_timer(
+                    self.driver.member_status_interval,
+                    self.driver.collect_member_status,
+                    None
+                )
+            if self.driver.stats_interval > 0:
+                self.tg.add_timer(
+                    self.driver.stats_interval,
+                    self.driver.collect_stats,
+                    None
+                )
+            if self.driver.reconcile_interval > 0:
+                self.tg.add_timer(
+                    self.driver.reconcile_interval,
+                    self.driver.reconcile_loadbalancers,
+                    self.driver.reconcile_interval
+                )
+            if self.driver.shards.membership is not None:
+                self.tg.add_timer(
+                    self.driver.shards.membership.ttl / 3,
+                    self.driver.shards.refresh,
+                    None
+                )
+            if self.driver.driver_conf.metrics_textfile:
+                self.tg.add_timer(
+                    self.driver.metrics_flush_interval,
+                    metrics.METRICS.flush,
+                    None
+                )
         except :
             LOG.error("an exception happened in the thread")
             raise
+
+    def stop(self, graceful=False):
+        # Hand the load balancers of this worker over right away instead
+        # of after its heartbeat expired.
+        self.driver.shards.leave()
+        super(NetScalerStatusService, self).stop(graceful)
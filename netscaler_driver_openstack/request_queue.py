@@ -0,0 +1,293 @@
+# Copyright 2015 Citrix Systems, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import itertools
+import os
+import socket
+import threading
+import time
+import zlib
+
+import eventlet
+from eventlet import queue
+from neutron.i18n import _LE
+from neutron.i18n import _LI
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import ncc_client
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 5
+# Seconds to wait before the first resend of a failed request, doubled on
+# every further attempt.
+RETRY_DELAY = 1
+REQUEST_FILE_SUFFIX = '.json'
+
+
+class NCCRequestQueue(object):
+
+    """Durable queue of NCC mutations sent by background workers.
+
+    Every request is written to a file in queue_dir before it is
+    acknowledged, and the file is removed once NCC accepted the request,
+    so requests queued before a neutron-server restart are sent after it.
+    Requests of one load balancer always go to the same worker and are
+    sent in the order they were queued.
+
+    queue_dir may be shared by the neutron-server workers of a host.
+    Each process keeps its requests in a subdirectory named after its
+    host and pid. Requests left by a process that is gone are moved back
+    to queue_dir on start, and a process sends such a request only after
+    claiming it by renaming it into its own subdirectory. The requests
+    of a load balancer are sent by the process that claimed the first of
+    them.
+
+    sent_callback(request) is called after NCC accepted a request and
+    failed_callback(request) after it was rejected or could not be sent
+    within max_attempts.
+    """
+
+    def __init__(self, client, queue_dir, workers=DEFAULT_WORKERS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, sent_callback=None,
+                 failed_callback=None):
+        self.client = client
+        self.queue_dir = queue_dir
+        self.max_attempts = int(max_attempts)
+        self.sent_callback = sent_callback
+        self.failed_callback = failed_callback
+        self._queues = [queue.LightQueue() for __ in range(int(workers))]
+        self._pending = {}
+        self._claimed_elsewhere = set()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        if not os.path.isdir(queue_dir):
+            os.makedirs(queue_dir)
+
+    def start(self):
+        for worker_queue in self._queues:
+            eventlet.spawn_n(self._run_worker, worker_queue)
+        self._load()
+
+    def put(self, lb_id, entity_type, entity_id, method, tenant_id,
+            resource_path, object_name=None, object_data=None):
+        request = {'lb_id': lb_id,
+                   'entity_type': entity_type,
+                   'entity_id': entity_id,
+                   'method': method,
+                   'tenant_id': tenant_id,
+                   'resource_path': resource_path,
+                   'object_name': object_name,
+                   'object_data': object_data}
+        name = "%020d-%06d%s" % (int(time.time() * 1000000),
+                                 next(self._sequence) % 1000000,
+                                 REQUEST_FILE_SUFFIX)
+        path = os.path.join(self._get_own_dir(), name)
+        # Write to a temporary file first, a crash must not leave a
+        # half written request behind.
+        with open(path + '.tmp', 'w') as request_file:
+            request_file.write(jsonutils.dumps(request))
+            request_file.flush()
+            os.fsync(request_file.fileno())
+        os.rename(path + '.tmp', path)
+        self._enqueue(path, request)
+
+    def is_pending(self, lb_id):
+        return self._pending.get(lb_id, 0) > 0
+
+    def _get_own_dir(self):
+        # Computed on every use, a forked worker gets a directory of its
+        # own.
+        own_dir = os.path.join(self.queue_dir, "%s-%d" % (
+            socket.gethostname(), os.getpid()))
+        if not os.path.isdir(own_dir):
+            try:
+                os.makedirs(own_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        return own_dir
+
+    def _release_abandoned(self):
+        """Move the requests of dead processes of this host to queue_dir."""
+        prefix = socket.gethostname() + '-'
+        for name in os.listdir(self.queue_dir):
+            process_dir = os.path.join(self.queue_dir, name)
+            if (not name.startswith(prefix) or
+                    not os.path.isdir(process_dir)):
+                continue
+            try:
+                pid = int(name[len(prefix):])
+            except ValueError:
+                continue
+            if _is_alive(pid):
+                continue
+            try:
+                request_names = os.listdir(process_dir)
+            except OSError:
+                # Another worker released it concurrently.
+                continue
+            for request_name in request_names:
+                if request_name.endswith(REQUEST_FILE_SUFFIX):
+                    _rename(os.path.join(process_dir, request_name),
+                            os.path.join(self.queue_dir, request_name))
+                else:
+                    # Half written, never acknowledged.
+                    _remove(os.path.join(process_dir, request_name))
+            try:
+                os.rmdir(process_dir)
+            except OSError:
+                # Another worker released it concurrently.
+                pass
+
+    def _load(self):
+        self._release_abandoned()
+        names = sorted(name for name in os.listdir(self.queue_dir)
+                       if name.endswith(REQUEST_FILE_SUFFIX))
+        if names:
+            LOG.info(_LI("Resending %d queued NetScaler Control Center "
+                         "requests"), len(names))
+        for name in names:
+            path = os.path.join(self.queue_dir, name)
+            try:
+                with open(path) as request_file:
+                    request = jsonutils.loads(request_file.read())
+            except Exception:
+                LOG.exception(_LE("Dropping unreadable queued request %s"),
+                              path)
+                _remove(path)
+                continue
+            self._enqueue(path, request, claimed=False)
+
+    def _claim(self, path, request):
+        """Rename a loaded request into the directory of this process.
+
+        Return the new path, or None when another process claimed it or
+        an earlier request of the same load balancer.
+        """
+        lb_id = request['lb_id']
+        if lb_id in self._claimed_elsewhere:
+            return None
+        claimed_path = os.path.join(self._get_own_dir(),
+                                    os.path.basename(path))
+        if _rename(path, claimed_path):
+            return claimed_path
+        self._claimed_elsewhere.add(lb_id)
+        return None
+
+    def _enqueue(self, path, request, claimed=True):
+        lb_id = request['lb_id']
+        with self._lock:
+            self._pending[lb_id] = self._pending.get(lb_id, 0) + 1
+        shard = zlib.crc32(str(lb_id)) % len(self._queues)
+        self._queues[shard].put((path, request, claimed))
+
+    def _run_worker(self, worker_queue):
+        while True:
+            path, request, claimed = worker_queue.get()
+            own_path = path if claimed else None
+            try:
+                if not claimed:
+                    own_path = self._claim(path, request)
+                if own_path:
+                    self._send(request)
+            except Exception:
+                LOG.exception(_LE("Unexpected error sending queued request "
+                                  "%s"), path)
+            finally:
+                if own_path:
+                    _remove(own_path)
+                with self._lock:
+                    lb_id = request['lb_id']
+                    self._pending[lb_id] -= 1
+                    if not self._pending[lb_id]:
+                        del self._pending[lb_id]
+                        # No request of it is left that another process
+                        # could have claimed.
+                        self._claimed_elsewhere.discard(lb_id)
+
+    def _send(self, request):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self._execute(request)
+            except Exception as e:
+                # NCC answered with a client error, resending won't help.
+                status = getattr(e, 'status', None)
+                rejected = status is not None and 400 <= int(status) < 500
+                if (rejected or attempt == self.max_attempts or
+                        not self._is_retriable(request, e)):
+                    LOG.error(_LE("Queued %(method)s of %(path)s failed "
+                                  "after %(attempt)d attempts"),
+                              {"method": request['method'],
+                               "path": request['resource_path'],
+                               "attempt": attempt})
+                    if self.failed_callback:
+                        self.failed_callback(request)
+                    return
+                eventlet.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+            else:
+                if self.sent_callback:
+                    self.sent_callback(request)
+                return
+
+    def _is_retriable(self, request, error):
+        """A create is resent only if it surely did not reach NCC."""
+        if request['method'] != 'POST':
+            return True
+        return (isinstance(error, ncc_client.NCCException) and
+                error.error == ncc_client.NCCException.CONNECTION_ERROR)
+
+    def _execute(self, request):
+        method = request['method']
+        tenant_id = request['tenant_id']
+        resource_path = request['resource_path']
+        if method == 'POST':
+            return self.client.create_resource(tenant_id, resource_path,
+                                               request['object_name'],
+                                               request['object_data'])
+        elif method == 'PUT':
+            return self.client.update_resource(tenant_id, resource_path,
+                                               request['object_name'],
+                                               request['object_data'])
+        return self.client.remove_resource(tenant_id, resource_path)
+
+
+def _rename(source, target):
+    """Return False when source no longer exists."""
+    try:
+        os.rename(source, target)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return False
+    return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
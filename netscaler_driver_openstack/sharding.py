@@ -0,0 +1,159 @@
+# Copyright 2015 Citrix Systems, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import bisect
+import hashlib
+import os
+import socket
+import threading
+import time
+
+from neutron.i18n import _LI
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_HEARTBEAT_TTL = 30
+# Points of every member on the ring, more points spread the keys more
+# evenly across the members.
+DEFAULT_REPLICAS = 64
+HEARTBEAT_FILE_SUFFIX = '.heartbeat'
+
+
+class HashRing(object):
+
+    """Consistent hash ring mapping keys to members.
+
+    When a member joins or leaves, only the keys of the ring segments it
+    gains or loses move to another member.
+    """
+
+    def __init__(self, members, replicas=DEFAULT_REPLICAS):
+        self.members = sorted(set(members))
+        self._points = []
+        for member in self.members:
+            for replica in range(replicas):
+                self._points.append(
+                    (_hash("%s-%d" % (member, replica)), member))
+        self._points.sort()
+        self._hashes = [point for point, __ in self._points]
+
+    def get_member(self, key):
+        if not self._points:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key))
+        return self._points[index % len(self._points)][1]
+
+
+class FileMembership(object):
+
+    """Live members of a group, tracked with heartbeat files.
+
+    Every member regularly rewrites a file named after itself in
+    directory, which has to be shared by all members, e.g. on a shared
+    file system for the neutron servers of several hosts. Members whose
+    file was not rewritten within ttl seconds are considered dead, so
+    the clocks of the hosts must be in sync to well within ttl.
+    """
+
+    def __init__(self, directory, ttl=DEFAULT_HEARTBEAT_TTL):
+        self.directory = directory
+        self.ttl = float(ttl)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @property
+    def member_id(self):
+        # Computed on every use, a forked worker is a member of its own.
+        return "%s-%d" % (socket.gethostname(), os.getpid())
+
+    def heartbeat(self):
+        path = self._path(self.member_id)
+        with open(path + '.tmp', 'w') as heartbeat_file:
+            heartbeat_file.write("%f\n" % time.time())
+        os.rename(path + '.tmp', path)
+
+    def leave(self):
+        try:
+            os.remove(self._path(self.member_id))
+        except OSError:
+            pass
+
+    def members(self):
+        now = time.time()
+        members = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(HEARTBEAT_FILE_SUFFIX):
+                continue
+            try:
+                mtime = os.path.getmtime(os.path.join(self.directory, name))
+            except OSError:
+                # Removed by a member that left.
+                continue
+            if now - mtime <= self.ttl:
+                members.append(name[:-len(HEARTBEAT_FILE_SUFFIX)])
+        return members
+
+    def _path(self, member_id):
+        return os.path.join(self.directory,
+                            member_id + HEARTBEAT_FILE_SUFFIX)
+
+
+class ShardAssignment(object):
+
+    """Decides which keys, e.g. load balancer ids, this worker owns.
+
+    refresh() sends the heartbeat of this worker and rebuilds the hash
+    ring from the live members. Without a membership every key is owned,
+    which is the behaviour of a single worker.
+    """
+
+    def __init__(self, membership=None, replicas=DEFAULT_REPLICAS):
+        self.membership = membership
+        self.replicas = replicas
+        self.ring = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        if self.membership is None:
+            return
+        self.membership.heartbeat()
+        members = self.membership.members()
+        if self.membership.member_id not in members:
+            # Our own heartbeat is always fresh, unless the clock of the
+            # shared file system is off; own at least our segments.
+            members.append(self.membership.member_id)
+        with self._lock:
+            if self.ring is not None and self.ring.members == sorted(members):
+                return
+            self.ring = HashRing(members, self.replicas)
+        LOG.info(_LI("Status collection shared by %(count)d workers: "
+                     "%(members)s"),
+                 {"count": len(members),
+                  "members": ", ".join(self.ring.members)})
+
+    def owns(self, key):
+        if self.membership is None:
+            return True
+        if self.ring is None:
+            self.refresh()
+        return self.ring.get_member(key) == self.membership.member_id
+
+    def leave(self):
+        if self.membership is not None:
+            self.membership.leave()
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:8], 16)
@@ -0,0 +1,203 @@
+# Copyright 2015 Citrix Systems, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests of the metrics registry and its emitters."""
+
+import os
+import shutil
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import metrics
+
+
+class _RecordingEmitter(metrics.MetricsEmitter):
+
+    def __init__(self):
+        self.records = []
+        self.flushed = []
+
+    def record(self, kind, name, value, labels):
+        self.records.append((kind, name, value, labels))
+
+    def flush(self, registry):
+        self.flushed.append(registry)
+
+
+class _FailingEmitter(metrics.MetricsEmitter):
+
+    def record(self, kind, name, value, labels):
+        raise RuntimeError("record")
+
+    def flush(self, registry):
+        raise RuntimeError("flush")
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry(buckets=(1, 0.1))
+
+    def test_counters_add_up_per_labels(self):
+        self.registry.increment('requests', method='GET')
+        self.registry.increment('requests', 2, method='GET')
+        self.registry.increment('requests', method='PUT')
+        counters = self.registry.snapshot()['counters']
+        self.assertEqual(3, counters[('requests', (('method', 'GET'),))])
+        self.assertEqual(1, counters[('requests', (('method', 'PUT'),))])
+
+    def test_gauge_keeps_last_value(self):
+        self.registry.set_gauge('tracked', 5)
+        self.registry.set_gauge('tracked', 2)
+        self.assertEqual({('tracked', ()): 2},
+                         self.registry.snapshot()['gauges'])
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.05, 0.5, 0.5, 3):
+            self.registry.observe('duration', value)
+        histogram = self.registry.snapshot()['histograms'][('duration', ())]
+        self.assertEqual([(0.1, 1), (1, 3), ('+Inf', 4)],
+                         histogram['buckets'])
+        self.assertEqual(4, histogram['count'])
+        self.assertAlmostEqual(4.05, histogram['sum'])
+
+    def test_timer_observes_block(self):
+        with self.registry.timer('cycle', kind='status'):
+            pass
+        histograms = self.registry.snapshot()['histograms']
+        self.assertEqual(1, histograms[('cycle', (('kind', 'status'),))][
+            'count'])
+
+    def test_snapshot_is_a_copy(self):
+        snapshot = self.registry.snapshot()
+        self.registry.increment('requests')
+        self.assertEqual({}, snapshot['counters'])
+
+    def test_reset(self):
+        self.registry.increment('requests')
+        self.registry.set_gauge('tracked', 1)
+        self.registry.observe('duration', 1)
+        self.registry.reset()
+        self.assertEqual({'counters': {}, 'gauges': {}, 'histograms': {}},
+                         self.registry.snapshot())
+
+    def test_values_are_handed_to_emitters(self):
+        emitter = _RecordingEmitter()
+        self.registry.set_emitters([emitter])
+        self.registry.increment('requests', method='GET')
+        self.registry.set_gauge('tracked', 2)
+        self.registry.observe('duration', 0.5)
+        self.registry.flush()
+        self.assertEqual(
+            [(metrics.COUNTER, 'requests', 1, {'method': 'GET'}),
+             (metrics.GAUGE, 'tracked', 2, {}),
+             (metrics.HISTOGRAM, 'duration', 0.5, {})], emitter.records)
+        self.assertEqual([self.registry], emitter.flushed)
+
+    def test_emitter_errors_are_ignored(self):
+        emitter = _RecordingEmitter()
+        self.registry.set_emitters([_FailingEmitter(), emitter])
+        self.registry.increment('requests')
+        self.registry.flush()
+        self.assertEqual(1, len(emitter.records))
+        self.assertEqual(1, len(emitter.flushed))
+
+
+class StatsdEmitterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(self.server.close)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.settimeout(5)
+        self.emitter = metrics.StatsdEmitter(*self.server.getsockname())
+
+    def receive(self):
+        return self.server.recv(1024).decode('utf-8')
+
+    def test_counter_with_labels_in_sorted_order(self):
+        self.emitter.record(metrics.COUNTER, 'requests', 2,
+                            {'status': 200, 'method': 'GET'})
+        self.assertEqual('netscaler_lbaas.requests.GET.200:2|c',
+                         self.receive())
+
+    def test_gauge(self):
+        self.emitter.record(metrics.GAUGE, 'tracked', 7, {})
+        self.assertEqual('netscaler_lbaas.tracked:7|g', self.receive())
+
+    def test_histogram_as_timer_in_milliseconds(self):
+        self.emitter.record(metrics.HISTOGRAM, 'duration', 0.25,
+                            {'uri': 'v2.0/lbaas'})
+        self.assertEqual('netscaler_lbaas.duration.v2_0_lbaas:250.000|ms',
+                         self.receive())
+
+
+class PrometheusTextfileEmitterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.emitter = metrics.PrometheusTextfileEmitter(
+            os.path.join(self.directory, 'netscaler.prom'))
+        self.registry = metrics.MetricsRegistry(buckets=(1,))
+
+    def test_format(self):
+        self.registry.increment('requests', method='GET')
+        self.registry.set_gauge('tracked', 2)
+        self.registry.observe('duration', 0.5, uri='a"b')
+        self.assertEqual(
+            '# TYPE netscaler_lbaas_requests counter\n'
+            'netscaler_lbaas_requests{method="GET",worker="7"} 1\n'
+            '# TYPE netscaler_lbaas_tracked gauge\n'
+            'netscaler_lbaas_tracked{worker="7"} 2\n'
+            '# TYPE netscaler_lbaas_duration histogram\n'
+            'netscaler_lbaas_duration_bucket'
+            '{uri="a\\"b",worker="7",le="1"} 1\n'
+            'netscaler_lbaas_duration_bucket'
+            '{uri="a\\"b",worker="7",le="+Inf"} 1\n'
+            'netscaler_lbaas_duration_sum{uri="a\\"b",worker="7"} 0.5\n'
+            'netscaler_lbaas_duration_count{uri="a\\"b",worker="7"} 1\n',
+            self.emitter.format(self.registry.snapshot(), 7))
+
+    def test_flush_writes_file_of_process(self):
+        self.registry.increment('requests')
+        self.emitter.flush(self.registry)
+        path = os.path.join(self.directory,
+                            'netscaler.%d.prom' % os.getpid())
+        self.assertEqual([os.path.basename(path)],
+                         os.listdir(self.directory))
+        with open(path) as metrics_file:
+            self.assertIn('netscaler_lbaas_requests{worker="%d"} 1' %
+                          os.getpid(), metrics_file.read())
+        self.assertEqual(0o644, stat.S_IMODE(os.stat(path).st_mode))
+
+    def test_flush_removes_files_of_dead_processes(self):
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        dead_path = self.emitter.get_path(process.pid)
+        other_path = os.path.join(self.directory, 'other.1.prom')
+        for path in (dead_path, other_path):
+            open(path, 'w').close()
+        self.emitter.flush(self.registry)
+        self.assertEqual(
+            sorted(['netscaler.%d.prom' % os.getpid(), 'other.1.prom']),
+            sorted(os.listdir(self.directory)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,418 @@
+# Copyright 2015 Citrix Systems, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests of NCCResponse, and of NSClient against the fake NCC of
+tools/fake_ncc.py.
+
+Needs the driver installed in neutron_lbaas like in a deployment.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+import unittest
+
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import metrics
+from neutron_lbaas.services.loadbalancer.drivers.netscaler import ncc_client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'tools'))
+import fake_ncc  # noqa
+
+LBS_PATH = "v2.0/lbaas/loadbalancers"
+
+
+class NSClientTestCase(unittest.TestCase):
+
+    def start_fake(self, **kwargs):
+        fake = fake_ncc.FakeNCC(job_duration=0, **kwargs).start()
+        self.addCleanup(fake.stop)
+        return fake
+
+    def make_client(self, service_uri, **kwargs):
+        kwargs.setdefault('retry_backoff', 0.01)
+        kwargs.setdefault('retry_max_backoff', 0.05)
+        kwargs.setdefault('circuit_failure_threshold', 0)
+        client = ncc_client.NSClient(service_uri, 'nsroot', 'nsroot',
+                                     **kwargs)
+        for endpoint in client.endpoints:
+            self.addCleanup(endpoint.connection_pool.close)
+        return client
+
+    def create_lb(self, client, lb_id='lb-1'):
+        return client.create_resource('tenant', LBS_PATH, 'loadbalancer',
+                                      {'id': lb_id})
+
+
+class NCCResponseTestCase(unittest.TestCase):
+
+    def iter_items(self, body, collection='members', status=200):
+        response = ncc_client.NCCResponse(status, body, [])
+        return list(response.iter_items(collection))
+
+    def assertItems(self, body, collection='members'):
+        """Check iter_items against decoding the whole body."""
+        expected = json.loads(body).get(collection) or []
+        self.assertEqual(expected, self.iter_items(body, collection))
+        response = ncc_client.NCCResponse(200, body, [])
+        response.dict
+        self.assertEqual(expected, list(response.iter_items(collection)))
+
+    def test_empty_list(self):
+        self.assertEqual([], self.iter_items('{"members": []}'))
+
+    def test_missing_collection(self):
+        self.assertEqual([], self.iter_items('{"count": 2, "pools": [1]}'))
+        self.assertEqual([], self.iter_items('{}'))
+
+    def test_empty_body_and_error_status(self):
+        self.assertEqual([], self.iter_items(''))
+        self.assertEqual([], self.iter_items('{"members": [{"id": "1"}]}',
+                                             status=500))
+
+    def test_items(self):
+        self.assertItems('{"members": [{"id": "1"}, {"id": "2"}], '
+                         '"count": 2}')
+
+    def test_nested_objects(self):
+        self.assertItems('{"meta": {"members": [1, {"a": "]"}]}, '
+                         '"members": [{"id": "1", "a": {"b": [1, [2]]}}, '
+                         '{"id": "2", "c": []}]}')
+
+    def test_whitespace(self):
+        self.assertItems('\n {\n\t"count" : 1 ,\n\t"members" :\r\n [\n'
+                         '  { "id" : "1" } ,\n  {"id": "2"}\n ] \n}\n')
+
+    def test_escaped_strings(self):
+        self.assertItems('{"members\\"": [{"id": "0"}], '
+                         '"members": [{"id": "1", "name": "a\\"b\\\\"}, '
+                         '{"id": "\\u00e9]}", "name": "\\\\\\""}]}')
+
+
+class RetryTestCase(NSClientTestCase):
+
+    def test_get_retried_after_unavailable(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, max_retries=3)
+        client.login()
+        fake.failure_rate = 0.5
+        # The first request draws a failure, the second one does not.
+        fake.random = random.Random(9)
+        sent = fake.request_count
+        status, __ = client.retrieve_resource('tenant', LBS_PATH)
+        self.assertEqual(200, status)
+        self.assertEqual(2, fake.request_count - sent)
+
+    def test_get_fails_after_max_retries(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, max_retries=2)
+        client.login()
+        fake.failure_rate = 1
+        sent = fake.request_count
+        self.assertRaises(ncc_client.NCCException, client.retrieve_resource,
+                          'tenant', LBS_PATH)
+        self.assertEqual(3, fake.request_count - sent)
+
+    def test_post_not_retried_after_unavailable(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, max_retries=3)
+        client.login()
+        fake.failure_rate = 1
+        sent = fake.request_count
+        self.assertRaises(ncc_client.NCCException, self.create_lb, client)
+        self.assertEqual(1, fake.request_count - sent)
+
+    def test_post_not_resent_after_read_timeout(self):
+        fake = self.start_fake(timeout=0.5)
+        client = self.make_client(
+            fake.uri, max_retries=3,
+            timeouts={ncc_client.CRUD_OPERATION:
+                      ncc_client.NCCTimeouts(1, 0.2, 5)})
+        client.login()
+        fake.timeout_rate = 1
+        sent = fake.request_count
+        self.assertRaises(ncc_client.NCCException, self.create_lb, client)
+        # NCC may have received it, a second POST could create it twice.
+        self.assertEqual(1, fake.request_count - sent)
+        self.assertEqual([], fake.journal)
+
+
+class ConnectionPoolTestCase(NSClientTestCase):
+
+    def close_ncc_connections(self, fake):
+        fake.close_connections()
+        # Give the FIN time to reach the client sockets.
+        time.sleep(0.1)
+
+    def count_reconnects(self):
+        counters = metrics.METRICS.snapshot()['counters']
+        return sum(value for (name, labels), value in counters.items()
+                   if name == 'ncc_request_retries_total' and
+                   ('reason', 'reconnect') in labels)
+
+    def test_connection_reused(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri)
+        client.login()
+        for __ in range(3):
+            status, __ = client.retrieve_resource('tenant', LBS_PATH)
+            self.assertEqual(200, status)
+        self.assertEqual(4, fake.request_count)
+        self.assertEqual(1, fake.connection_count)
+
+    def test_idle_connection_dropped_after_idle_timeout(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, connection_idle_timeout=0.1)
+        client.login()
+        time.sleep(0.2)
+        status, __ = client.retrieve_resource('tenant', LBS_PATH)
+        self.assertEqual(200, status)
+        self.assertEqual(2, fake.connection_count)
+
+    def test_connection_closed_by_ncc_dropped(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri)
+        client.login()
+        self.close_ncc_connections(fake)
+        reconnects = self.count_reconnects()
+        sent = fake.request_count
+        status, __ = client.retrieve_resource('tenant', LBS_PATH)
+        self.assertEqual(200, status)
+        self.assertEqual(1, fake.request_count - sent)
+        self.assertEqual(2, fake.connection_count)
+        # The pool noticed the close, the request was not sent on it.
+        self.assertEqual(reconnects, self.count_reconnects())
+
+    def test_get_resent_after_ncc_closed_idle_connection(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, max_retries=0)
+        client.login()
+        # NCC closes the connection after the liveness check of the pool.
+        client.endpoints[0].connection_pool._is_dropped = (
+            lambda connection: False)
+        self.close_ncc_connections(fake)
+        reconnects = self.count_reconnects()
+        status, __ = client.retrieve_resource('tenant', LBS_PATH)
+        self.assertEqual(200, status)
+        self.assertEqual(2, fake.connection_count)
+        self.assertEqual(reconnects + 1, self.count_reconnects())
+
+    def test_post_not_resent_after_ncc_closed_idle_connection(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, max_retries=3)
+        client.login()
+        client.endpoints[0].connection_pool._is_dropped = (
+            lambda connection: False)
+        self.close_ncc_connections(fake)
+        self.assertRaises(ncc_client.NCCException, self.create_lb, client)
+        self.assertEqual(1, fake.connection_count)
+        self.assertEqual([], fake.journal)
+
+
+class LoginTestCase(NSClientTestCase):
+
+    def retrieve_concurrently(self, client, count):
+        statuses = []
+
+        def retrieve():
+            status, __ = client.retrieve_resource('tenant', LBS_PATH)
+            statuses.append(status)
+
+        threads = [threading.Thread(target=retrieve) for __ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        return statuses
+
+    def test_expired_session_renewed(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri)
+        client.login()
+        fake.expire_sessions()
+        sent = fake.request_count
+        status, __ = client.retrieve_resource('tenant', LBS_PATH)
+        self.assertEqual(200, status)
+        # Rejected request, login and the request again.
+        self.assertEqual(3, fake.request_count - sent)
+        self.assertEqual(1, len(fake.sessions))
+
+    def test_concurrent_requests_share_first_login(self):
+        fake = self.start_fake(latency=0.05)
+        client = self.make_client(fake.uri)
+        self.assertEqual([200] * 10, self.retrieve_concurrently(client, 10))
+        self.assertEqual(1, len(fake.sessions))
+
+    def test_concurrent_requests_share_renewed_session(self):
+        fake = self.start_fake(latency=0.05)
+        client = self.make_client(fake.uri)
+        client.login()
+        fake.expire_sessions()
+        self.assertEqual([200] * 10, self.retrieve_concurrently(client, 10))
+        self.assertEqual(1, len(fake.sessions))
+
+    def test_logins_limited_when_sessions_rejected(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, max_login_retries=2)
+        client.login()
+        # Every session is rejected as expired.
+        fake.session_ttl = 0
+        sent = fake.request_count
+        try:
+            client.retrieve_resource('tenant', LBS_PATH)
+        except ncc_client.NCCException as e:
+            self.assertEqual(401, e.status)
+        else:
+            self.fail("NCCException not raised")
+        # The request, and two logins each followed by the request.
+        self.assertEqual(5, fake.request_count - sent)
+
+
+class CircuitBreakerTestCase(NSClientTestCase):
+
+    def test_open_breaker_fails_fast_and_closes_after_probe(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, max_retries=0,
+                                  circuit_failure_threshold=2,
+                                  circuit_reset_timeout=0.1)
+        client.login()
+        fake.failure_rate = 1
+        for __ in range(2):
+            self.assertRaises(ncc_client.NCCException,
+                              client.retrieve_resource, 'tenant', LBS_PATH)
+        breaker = client.endpoints[0].circuit_breaker
+        self.assertTrue(breaker.is_open())
+        sent = fake.request_count
+        self.assertRaises(ncc_client.NCCException, client.retrieve_resource,
+                          'tenant', LBS_PATH)
+        self.assertEqual(sent, fake.request_count)
+        fake.failure_rate = 0
+        deadline = time.time() + 5
+        while breaker.is_open() and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(breaker.is_open())
+        status, __ = client.retrieve_resource('tenant', LBS_PATH)
+        self.assertEqual(200, status)
+
+    def test_breaker_stays_open_while_ncc_unavailable(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, max_retries=0,
+                                  circuit_failure_threshold=1,
+                                  circuit_reset_timeout=0.1)
+        client.login()
+        # NCC behind a proxy that still accepts connections.
+        fake.failure_rate = 1
+        self.assertRaises(ncc_client.NCCException, client.retrieve_resource,
+                          'tenant', LBS_PATH)
+        breaker = client.endpoints[0].circuit_breaker
+        sent = fake.request_count
+        time.sleep(0.5)
+        self.assertGreater(fake.request_count, sent)
+        self.assertTrue(breaker.is_open())
+
+
+class DeadlineTestCase(NSClientTestCase):
+
+    def make_client(self, service_uri, **kwargs):
+        kwargs.setdefault('timeouts', {
+            ncc_client.STATUS_OPERATION: ncc_client.NCCTimeouts(1, 5, 0.5)})
+        return super(DeadlineTestCase, self).make_client(service_uri,
+                                                         **kwargs)
+
+    def retrieve_status(self, client):
+        return client.retrieve_resource(
+            'tenant', LBS_PATH, operation=ncc_client.STATUS_OPERATION)
+
+    def assertTakes(self, maximum, function, *args):
+        start = time.time()
+        self.assertRaises(ncc_client.NCCException, function, *args)
+        self.assertLess(time.time() - start, maximum)
+
+    def test_deadline_bounds_slow_request_and_retries(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri, max_retries=5)
+        client.login()
+        fake.latency = 2
+        self.assertTakes(1, self.retrieve_status, client)
+
+    def test_deadline_includes_login(self):
+        fake = self.start_fake(latency=0.4)
+        client = self.make_client(fake.uri)
+        # The login leaves 0.1 seconds of the deadline for the request.
+        self.assertTakes(0.7, self.retrieve_status, client)
+
+    def test_deadline_bounds_wait_for_login_lock(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri)
+        endpoint = client.endpoints[0]
+        endpoint.login_lock.acquire()
+        self.addCleanup(endpoint.login_lock.release)
+        self.assertTakes(1, self.retrieve_status, client)
+
+    def test_crud_timeouts_apply_by_default(self):
+        fake = self.start_fake()
+        client = self.make_client(fake.uri)
+        client.login()
+        fake.latency = 0.7
+        status, __ = client.retrieve_resource('tenant', LBS_PATH)
+        self.assertEqual(200, status)
+
+
+class FailoverTestCase(NSClientTestCase):
+
+    def start_dead_uri(self):
+        fake = fake_ncc.FakeNCC().start()
+        fake.stop()
+        return fake.uri
+
+    def test_mutation_fails_over_to_next_node(self):
+        fake = self.start_fake()
+        client = self.make_client("%s,%s" % (self.start_dead_uri(), fake.uri),
+                                  max_retries=2)
+        self.create_lb(client, 'lb-1')
+        self.assertIs(client.endpoints[1], client.active_endpoint)
+        self.create_lb(client, 'lb-2')
+        self.assertEqual(['lb-1', 'lb-2'],
+                         sorted(entry['entity_id'] for entry in fake.journal))
+
+    def test_reads_spread_across_nodes(self):
+        fakes = [self.start_fake(), self.start_fake()]
+        client = self.make_client(",".join(fake.uri for fake in fakes))
+        for __ in range(4):
+            client.retrieve_resource('tenant', LBS_PATH)
+        # A login and two reads on every node.
+        self.assertEqual([3, 3], [fake.request_count for fake in fakes])
+
+    def test_reads_skip_node_with_open_breaker(self):
+        fakes = [self.start_fake(), self.start_fake()]
+        client = self.make_client(",".join(fake.uri for fake in fakes),
+                                  max_retries=1,
+                                  circuit_failure_threshold=1,
+                                  circuit_reset_timeout=60)
+        fakes[0].failure_rate = 1
+        status, __ = client.retrieve_resource('tenant', LBS_PATH)
+        self.assertEqual(200, status)
+        self.assertTrue(client.endpoints[0].circuit_breaker.is_open())
+        sent = fakes[0].request_count
+        for __ in range(3):
+            status, __ = client.retrieve_resource('tenant', LBS_PATH)
+            self.assertEqual(200, status)
+        self.assertEqual(sent, fakes[0].request_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,611 @@
+# Copyright 2015 Citrix Systems, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Local fake of the NetScaler Control Center REST API.
+
+Implements the requests the driver sends: session login, the
+v2.0/lbaas CRUD, bulk member and graph paths, journal contexts, member
+status and statistics. Mutations are applied by jobs that go from
+Pending over In Progress to Finished or Error, like on NCC, and latency,
+session expiry, hanging requests and 5xx responses can be injected.
+
+Only the standard library is used, so the fake runs without OpenStack:
+
+    python tools/fake_ncc.py --port 8080 --latency 0.05
+
+and the driver is pointed to it with netscaler_ncc_uri.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import socket
+import ssl
+import threading
+import time
+import uuid
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+    from urlparse import urlparse
+except ImportError:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs
+    from urllib.parse import urlparse
+
+LOGIN_PATH = '/nitro/v2/config/login'
+RESOURCE_PREFIX = '/v2.0/lbaas'
+JOURNAL_CONTEXTS_PATH = '/admin/v1/journalcontexts'
+MEMBER_STATUS_PATH = '/oca/v2/memberstatus'
+COLLECTIONS = {
+    'loadbalancers': 'loadbalancer',
+    'listeners': 'listener',
+    'pools': 'pool',
+    'healthmonitors': 'healthmonitor',
+    'members': 'member',
+}
+PENDING = 'Pending'
+IN_PROGRESS = 'In Progress'
+FINISHED = 'Finished'
+ERROR = 'Error'
+ITEM_NOT_FOUND = 'ItemNotFound'
+INTERNAL_ERROR = 'InternalError'
+DEFAULT_PAGE_SIZE = 300
+
+
+class FakeNCC(object):
+
+    """A fake NCC server and the state it serves.
+
+    latency is the delay added to every request, either seconds or a
+    (min, max) range. Jobs complete job_duration seconds after they were
+    accepted and fail with probability error_rate. Sessions expire after
+    session_ttl seconds or when expire_sessions() is called. Requests
+    are answered with failure_status with probability failure_rate, and
+    with probability timeout_rate the connection is held for timeout
+    seconds and closed without an answer. All settings can be changed
+    while the server runs. With certfile, and keyfile unless the key is
+    part of certfile, the fake serves HTTPS. connection_count counts the
+    connections accepted, close_connections() closes the open ones like
+    NCC closing idle keep-alive connections.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, username='nsroot',
+                 password='nsroot', latency=0, job_duration=1,
+                 error_rate=0, session_ttl=1800, failure_rate=0,
+                 failure_status=503, timeout_rate=0, timeout=30, seed=None,
+                 certfile=None, keyfile=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.job_duration = job_duration
+        self.error_rate = error_rate
+        self.session_ttl = session_ttl
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.random = random.Random(seed)
+        self.objects = dict((collection, {}) for collection in COLLECTIONS)
+        self.journal = []
+        self.sessions = {}
+        self._journal_index = {}
+        self.request_count = 0
+        self.connection_count = 0
+        self._connections = set()
+        self.lock = threading.RLock()
+        self._jobs = []
+        self._journal_ids = itertools.count(1)
+        self._server = None
+
+    @property
+    def uri(self):
+        scheme = "https" if self.certfile else "http"
+        return "%s://%s:%d" % (scheme, self.host, self.port)
+
+    def start(self):
+        self._bind()
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def serve_forever(self):
+        self._bind()
+        self._server.serve_forever()
+
+    def _bind(self):
+        self._server = _ThreadingHTTPServer((self.host, self.port),
+                                            _FakeNCCHandler)
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        if self.certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+            context.load_cert_chain(self.certfile, self.keyfile)
+            self._server.socket = context.wrap_socket(self._server.socket,
+                                                      server_side=True)
+
+    def add_connection(self, connection):
+        with self.lock:
+            self.connection_count += 1
+            self._connections.add(connection)
+
+    def remove_connection(self, connection):
+        with self.lock:
+            self._connections.discard(connection)
+
+    def close_connections(self):
+        with self.lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def expire_sessions(self):
+        with self.lock:
+            self.sessions.clear()
+
+    def login(self, credentials):
+        if (credentials.get('username') != self.username or
+                credentials.get('password') != self.password):
+            return None
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[session_id] = time.time()
+        return session_id
+
+    def is_valid_session(self, cookie):
+        match = re.search(r'SessId=(\w+)', cookie or '')
+        if not match:
+            return False
+        with self.lock:
+            created = self.sessions.get(match.group(1))
+            if created is None:
+                return False
+            if time.time() - created > self.session_ttl:
+                del self.sessions[match.group(1)]
+                return False
+        return True
+
+    def submit(self, entity_type, entity_id, operation, apply_change,
+               tenant_id=None, exists=True):
+        """Record a job that calls apply_change() once it finished."""
+        with self.lock:
+            context = {'id': next(self._journal_ids),
+                       'entity_type': entity_type,
+                       'entity_id': entity_id,
+                       'operation': operation,
+                       'tenant_id': tenant_id,
+                       'status': PENDING,
+                       'message': '',
+                       'error_reason': ''}
+            started = time.time()
+            if not exists:
+                outcome = ITEM_NOT_FOUND
+            elif self.random.random() < self.error_rate:
+                outcome = INTERNAL_ERROR
+            else:
+                outcome = None
+            self.journal.insert(0, context)
+            self._journal_index.setdefault(entity_id, []).append(context)
+            self._jobs.append((started, context, outcome, apply_change))
+        return context
+
+    def advance_jobs(self):
+        now = time.time()
+        with self.lock:
+            running = []
+            for job in self._jobs:
+                started, context, outcome, apply_change = job
+                if now - started < self.job_duration / 2.0:
+                    running.append(job)
+                elif now - started < self.job_duration:
+                    context['status'] = IN_PROGRESS
+                    running.append(job)
+                elif outcome:
+                    context['status'] = ERROR
+                    context['error_reason'] = outcome
+                    context['message'] = "%s %s failed: %s" % (
+                        context['operation'], context['entity_id'], outcome)
+                else:
+                    apply_change()
+                    context['status'] = FINISHED
+            self._jobs = running
+
+    def clear_journal(self):
+        with self.lock:
+            del self.journal[:]
+            self._journal_index.clear()
+            self._jobs = []
+
+    def get_journal_contexts(self, filters):
+        self.advance_jobs()
+        with self.lock:
+            if 'entity_id' in filters:
+                contexts = [context for entity_id in filters['entity_id']
+                            for context in
+                            self._journal_index.get(entity_id, ())]
+                contexts.sort(key=lambda context: -context['id'])
+            else:
+                contexts = self.journal
+            return [dict(context) for context in contexts
+                    if all(str(context.get(key)) in values
+                           for key, values in filters.items())]
+
+    def get_member_statuses(self):
+        with self.lock:
+            return [{'member_id': member['id'],
+                     'pool_id': member.get('pool_id'),
+                     'status': ('UP' if member.get('admin_state_up', True)
+                                else 'OUT OF SERVICE')}
+                    for member in self.objects['members'].values()]
+
+    def get_stats(self, collection, entity_id):
+        # Counters grow with the number of requests served, like traffic.
+        seed = sum(ord(char) for char in entity_id)
+        return {'bytes_in': seed * self.request_count,
+                'bytes_out': seed * self.request_count * 4,
+                'active_connections': seed % 100,
+                'total_connections': seed * self.request_count // 10}
+
+    def lb_id_of(self, collection, obj):
+        if collection == 'loadbalancers':
+            return obj.get('id')
+        if collection == 'listeners':
+            return obj.get('loadbalancer_id')
+        if collection == 'pools':
+            if obj.get('loadbalancer_id'):
+                return obj['loadbalancer_id']
+            listener = self.objects['listeners'].get(obj.get('listener_id'))
+            return listener and self.lb_id_of('listeners', listener)
+        if collection in ('healthmonitors', 'members'):
+            pool = self.objects['pools'].get(obj.get('pool_id'))
+            return pool and self.lb_id_of('pools', pool)
+
+    def create_graph(self, ncc_lb):
+        lb = dict(ncc_lb)
+        listeners = lb.pop('listeners', None) or []
+        changes = [('loadbalancers', lb)]
+        for ncc_listener in listeners:
+            listener = dict(ncc_listener)
+            pool = listener.pop('default_pool', None)
+            changes.append(('listeners', listener))
+            if pool:
+                pool = dict(pool)
+                members = pool.pop('members', None) or []
+                healthmonitor = pool.pop('healthmonitor', None)
+                changes.append(('pools', pool))
+                for member in members:
+                    member = dict(member, pool_id=pool['id'])
+                    changes.append(('members', member))
+                if healthmonitor:
+                    changes.append(('healthmonitors',
+                                    dict(healthmonitor, pool_id=pool['id'])))
+
+        def apply_change():
+            for collection, obj in changes:
+                self.objects[collection][obj['id']] = obj
+
+        return self.submit('graphs', lb['id'], 'POST', apply_change,
+                           lb.get('tenant_id'))
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _FakeNCCHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body in one segment, writing them separately
+    # stalls keep-alive clients on delayed ACKs.
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.fake.add_connection(self.connection)
+
+    def finish(self):
+        self.server.fake.remove_connection(self.connection)
+        BaseHTTPRequestHandler.finish(self)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _handle(self, method):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+        with fake.lock:
+            fake.request_count += 1
+        latency = fake.latency
+        if isinstance(latency, (tuple, list)):
+            latency = fake.random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+        if fake.random.random() < fake.timeout_rate:
+            time.sleep(fake.timeout)
+            self.close_connection = True
+            return
+        if fake.random.random() < fake.failure_rate:
+            return self._respond(fake.failure_status,
+                                 {'error': 'injected failure'})
+        try:
+            body = json.loads(raw_body.decode('utf-8')) if raw_body else {}
+        except ValueError:
+            return self._respond(400, {'error': 'invalid JSON'})
+        url = urlparse(self.path)
+        query = dict((key, values[0])
+                     for key, values in parse_qs(url.query).items())
+        path = url.path.rstrip('/')
+        if path == LOGIN_PATH and method == 'POST':
+            login = body.get('login') or {}
+            session_id = fake.login(login)
+            if not session_id:
+                return self._respond(401, {'error': 'invalid credentials'})
+            return self._respond(201, {'login': [{'sessionid': session_id}]})
+        if not fake.is_valid_session(self.headers.get('Cookie')):
+            return self._respond(401, {'error': 'session expired'})
+        tenant_id = self.headers.get('X-Tenant-ID')
+        if path == JOURNAL_CONTEXTS_PATH and method == 'GET':
+            contexts = fake.get_journal_contexts(
+                _parse_filter(query.get('filter')))
+            return self._respond_page('journalcontexts', contexts, query)
+        if path == MEMBER_STATUS_PATH and method == 'GET':
+            return self._respond_page('memberstatus',
+                                      fake.get_member_statuses(), query)
+        if path.startswith(RESOURCE_PREFIX + '/'):
+            segments = path[len(RESOURCE_PREFIX) + 1:].split('/')
+            return self._handle_resource(method, segments, body, query,
+                                         tenant_id)
+        self._respond(404, {'error': 'unknown path %s' % path})
+
+    def _handle_resource(self, method, segments, body, query, tenant_id):
+        fake = self.server.fake
+        collection = segments[0]
+        if collection == 'graphs' and len(segments) == 1:
+            if method != 'POST' or 'graph' not in body:
+                return self._respond(400, {'error': 'graph expected'})
+            ncc_lb = body['graph'].get('loadbalancer') or {}
+            fake.create_graph(ncc_lb)
+            return self._respond(202, body)
+        if collection == 'pools' and len(segments) >= 3:
+            if segments[2] != 'members':
+                return self._respond(404, {'error': 'unknown path'})
+            pool_id = segments[1]
+            if len(segments) == 3:
+                if 'members' in body or method == 'DELETE':
+                    return self._handle_bulk_members(method, pool_id, body,
+                                                     tenant_id)
+                return self._handle_objects(method, 'members', None, body,
+                                            dict(query, pool_id=pool_id),
+                                            tenant_id)
+            return self._handle_objects(method, 'members', segments[3],
+                                        body, {'pool_id': pool_id},
+                                        tenant_id)
+        if collection not in COLLECTIONS:
+            return self._respond(404, {'error': 'unknown collection'})
+        if len(segments) == 2 and segments[1] == 'stats':
+            key = ('loadbalancer_id' if collection == 'loadbalancers'
+                   else 'listener_id')
+            with fake.lock:
+                entity_ids = sorted(fake.objects[collection])
+            stats = [dict(fake.get_stats(collection, entity_id),
+                          **{key: entity_id}) for entity_id in entity_ids]
+            return self._respond_page('stats', stats, query)
+        if len(segments) == 3 and segments[2] == 'stats':
+            with fake.lock:
+                exists = segments[1] in fake.objects[collection]
+            if not exists:
+                return self._respond(404, {'error': ITEM_NOT_FOUND})
+            return self._respond(200, {'stats': fake.get_stats(
+                collection, segments[1])})
+        entity_id = segments[1] if len(segments) > 1 else None
+        return self._handle_objects(method, collection, entity_id, body,
+                                    query, tenant_id)
+
+    def _handle_objects(self, method, collection, entity_id, body, query,
+                        tenant_id):
+        fake = self.server.fake
+        singular = COLLECTIONS[collection]
+        objects = fake.objects[collection]
+        if method == 'GET':
+            with fake.lock:
+                if entity_id:
+                    obj = objects.get(entity_id)
+                    if obj is None:
+                        return self._respond(404, {'error': ITEM_NOT_FOUND})
+                    return self._respond(200, {singular: obj})
+                found = [candidate for candidate in objects.values()
+                         if _matches(fake, collection, candidate, query)]
+            return self._respond_page(collection, found, query)
+        if method == 'POST' and not entity_id:
+            obj = dict(body.get(singular) or {})
+            if 'id' not in obj:
+                return self._respond(400, {'error': '%s expected' % singular})
+            if 'pool_id' in query:
+                obj['pool_id'] = query['pool_id']
+            fake.submit(collection, obj['id'], 'POST',
+                        _setter(objects, obj), tenant_id)
+            return self._respond(202, {singular: obj})
+        if method == 'PUT' and entity_id:
+            changes = body.get(singular) or {}
+            with fake.lock:
+                exists = entity_id in objects
+            fake.submit(collection, entity_id, 'PUT',
+                        _updater(objects, dict(changes, id=entity_id)),
+                        tenant_id, exists)
+            return self._respond(202, {singular: changes})
+        if method == 'DELETE' and entity_id:
+            with fake.lock:
+                exists = entity_id in objects
+            fake.submit(collection, entity_id, 'DELETE',
+                        _remover(objects, entity_id), tenant_id, exists)
+            return self._respond(202, {})
+        self._respond(405, {'error': 'method not allowed'})
+
+    def _handle_bulk_members(self, method, pool_id, body, tenant_id):
+        fake = self.server.fake
+        objects = fake.objects['members']
+        results = []
+        for member in body.get('members') or []:
+            if not isinstance(member, dict):
+                member = {'id': member}
+            member = dict(member, pool_id=pool_id)
+            member_id = member.get('id')
+            with fake.lock:
+                exists = member_id in objects
+            if method != 'POST' and not exists:
+                results.append({'id': member_id, 'error': ITEM_NOT_FOUND})
+                continue
+            if method == 'POST':
+                apply_change = _setter(objects, member)
+            elif method == 'PUT':
+                apply_change = _updater(objects, member)
+            else:
+                apply_change = _remover(objects, member_id)
+            fake.submit('members', member_id, method, apply_change,
+                        tenant_id)
+            results.append(member)
+        self._respond(202, {'members': results})
+
+    def _respond_page(self, collection, items, query):
+        page = int(query.get('page') or 1)
+        size = int(query.get('size') or DEFAULT_PAGE_SIZE)
+        start = (page - 1) * size
+        self._respond(200, {collection: items[start:start + size],
+                            'count': len(items)})
+
+    def _respond(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _parse_filter(value):
+    """Parse filter=key:value,key:a|b into {key: set of values}."""
+    filters = {}
+    for condition in (value or '').split(','):
+        if ':' in condition:
+            key, values = condition.split(':', 1)
+            filters[key] = set(values.split('|'))
+    return filters
+
+
+def _matches(fake, collection, obj, query):
+    if 'loadbalancer_id' in query:
+        if fake.lb_id_of(collection, obj) != query['loadbalancer_id']:
+            return False
+    if 'pool_id' in query and obj.get('pool_id') != query['pool_id']:
+        return False
+    return True
+
+
+def _setter(objects, obj):
+    return lambda: objects.__setitem__(obj['id'], obj)
+
+
+def _updater(objects, changes):
+    def apply_update():
+        if changes['id'] in objects:
+            objects[changes['id']].update(changes)
+    return apply_update
+
+
+def _remover(objects, entity_id):
+    return lambda: objects.pop(entity_id, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--username', default='nsroot')
+    parser.add_argument('--password', default='nsroot')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds added to every request')
+    parser.add_argument('--latency-jitter', type=float, default=0,
+                        help='random seconds added on top of the latency')
+    parser.add_argument('--job-duration', type=float, default=1,
+                        help='seconds until a job finishes')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='fraction of jobs that end in Error')
+    parser.add_argument('--session-ttl', type=float, default=1800,
+                        help='seconds until a session expires')
+    parser.add_argument('--failure-rate', type=float, default=0,
+                        help='fraction of requests answered with an error')
+    parser.add_argument('--failure-status', type=int, default=503)
+    parser.add_argument('--timeout-rate', type=float, default=0,
+                        help='fraction of requests that are never answered')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='seconds a request that is never answered '
+                             'holds its connection')
+    parser.add_argument('--certfile',
+                        help='certificate to serve HTTPS with')
+    parser.add_argument('--keyfile',
+                        help='private key of the certificate')
+    args = parser.parse_args()
+    latency = args.latency
+    if args.latency_jitter:
+        latency = (args.latency, args.latency + args.latency_jitter)
+    fake = FakeNCC(args.host, args.port, args.username, args.password,
+                   latency, args.job_duration, args.error_rate,
+                   args.session_ttl, args.failure_rate, args.failure_status,
+                   args.timeout_rate, args.timeout, certfile=args.certfile,
+                   keyfile=args.keyfile)
+    print("Fake NetScaler Control Center listening on %s" % fake.uri)
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()